@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+"""
+Offline benchmarks of the parsers in stgithub, using the test fixtures.
+
+For every parsing path it reports throughput (records, pages or chunks per
+second) and peak memory allocated while parsing. Results can be saved as
+a baseline; later runs are compared to the baseline and the script exits
+with a non-zero status if throughput of any path regresses beyond
+the threshold.
+
+    python benchmark.py --save        # record a baseline
+    python benchmark.py               # compare to the baseline
+    python benchmark.py --parser lxml.html
+
+Peak memory is measured by tracemalloc, so it only includes memory
+allocated by Python; e.g. lxml trees are not accounted for.
+Baselines are machine specific and are not supposed to be committed.
+Requires Python 3.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import stgithub
+
+FIXTURES_DIR = 'fixtures'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+
+def _read(*path):
+    with open(os.path.join(FIXTURES_DIR, *path), 'rb') as fh:
+        return fh.read().decode('utf8')
+
+
+def _fixtures(dirname):
+    fixtures_dir = os.path.join(FIXTURES_DIR, dirname)
+    return [_read(dirname, fname) for fname in sorted(os.listdir(fixtures_dir))
+            if fname.endswith('.html')]
+
+
+def bench_record():
+    """ _parse_timeline_update_record(), including building the tree """
+    records = _fixtures('record')
+
+    def run():
+        for text in records:
+            stgithub._parse_timeline_update_record(stgithub._soup(text))
+    return run, len(records), 'records'
+
+
+def bench_stress_test():
+    """ _parse_timeline_update_record() on the largest record fixture """
+    text = _read('record', 'stress_test.html')
+
+    def run():
+        stgithub._parse_timeline_update_record(stgithub._soup(text))
+    return run, 1, 'records'
+
+
+def bench_month():
+    """ _parse_timeline_update(), including building the tree """
+    pages = _fixtures('month')
+
+    def run():
+        for text in pages:
+            list(stgithub._parse_timeline_update(stgithub._soup(text)))
+    return run, len(pages), 'pages'
+
+
+def bench_timeline_page():
+    """ _parse_timeline_page(): rows and the next page cursor """
+    pages = _fixtures('month')
+
+    def run():
+        for text in pages:
+            stgithub._parse_timeline_page(text)
+    return run, len(pages), 'pages'
+
+
+def bench_timeline_stream():
+    """ _parse_timeline_stream(): same as timeline_page, in 16K chunks """
+    pages = _fixtures('month')
+
+    def run():
+        for text in pages:
+            stgithub._parse_timeline_stream(
+                text[i:i + 16384] for i in range(0, len(text), 16384))
+    return run, len(pages), 'pages'
+
+
+def bench_feed_chunk():
+    """ _extract_activity_feed_links() on a single Atom entry content """
+    chunk = _read('activity_feed', 'chunk.html').encode('utf8')
+
+    def run():
+        list(stgithub._extract_activity_feed_links(chunk))
+    return run, 1, 'chunks'
+
+
+def bench_feed():
+    """ _parse_activity_feed() on a full Atom feed page """
+    feed = _read('activity_feed', 'feed.xml')
+
+    def run():
+        stgithub._parse_activity_feed(feed)
+    return run, 1, 'pages'
+
+
+def bench_calendar():
+    """ _parse_contrib_calendar(), contributions calendar SVG """
+    text = _read('calendar', 'contributions.html')
+
+    def run():
+        stgithub._parse_contrib_calendar(text, 2018)
+    return run, 1, 'pages'
+
+
+BENCHMARKS = (
+    ('record', bench_record),
+    ('stress_test', bench_stress_test),
+    ('month', bench_month),
+    ('timeline_page', bench_timeline_page),
+    ('timeline_stream', bench_timeline_stream),
+    ('feed_chunk', bench_feed_chunk),
+    ('feed', bench_feed),
+    ('calendar', bench_calendar),
+)
+
+
+def measure(run, items, min_time=0.5, rounds=5):
+    """ Measure throughput and peak memory of a benchmark
+
+    Returns:
+        Tuple[float, float]: best of `rounds` throughput, items per second,
+            and peak memory allocated during a single run, KB.
+    """
+    run()  # warm up, e.g. lazy imports
+    # calibrate number of runs per round to take at least min_time / rounds
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / rounds:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items * number / best, peak / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark stgithub parsers on test fixtures")
+    parser.add_argument('names', nargs='*',
+                        help="Benchmarks to run, default: all. "
+                             "Available: " + ", ".join(
+                                 name for name, _ in BENCHMARKS))
+    parser.add_argument('-p', '--parser', default=stgithub.HTML_PARSER,
+                        help="HTML parser backend, see stgithub.HTML_PARSER")
+    parser.add_argument('-b', '--baseline', default=DEFAULT_BASELINE,
+                        help="Baseline file, default: %(default)s")
+    parser.add_argument('-s', '--save', action='store_true',
+                        help="Save results as the new baseline")
+    parser.add_argument('-t', '--threshold', default=0.2, type=float,
+                        help="Max allowed throughput regression relative "
+                             "to the baseline, default: %(default)s")
+    parser.add_argument('--min-time', default=0.5, type=float,
+                        help="Min time per benchmark, seconds")
+    args = parser.parse_args()
+
+    stgithub.HTML_PARSER = args.parser
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+
+    results = {}
+    regressions = []
+    print("%-28s %14s %12s %10s" % ("benchmark", "throughput", "peak, KB",
+                                    "vs base"))
+    for name, bench in BENCHMARKS:
+        if args.names and name not in args.names:
+            continue
+        key = "%s[%s]" % (name, args.parser)
+        run, items, unit = bench()
+        rate, peak = measure(run, items, args.min_time)
+        results[key] = {'rate': rate, 'unit': unit + '/s', 'peak_kb': peak}
+
+        change = ''
+        if key in baseline:
+            ratio = rate / baseline[key]['rate']
+            change = "%+.1f%%" % ((ratio - 1) * 100)
+            if ratio < 1 - args.threshold:
+                regressions.append(key)
+                change += ' !'
+        print("%-28s %8.1f %-9s %8.1f %10s" % (
+            key, rate, unit + '/s', peak, change))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as fh:
+            json.dump(baseline, fh, indent=2, sort_keys=True)
+        print("Baseline saved to %s" % args.baseline)
+    elif regressions:
+        print("Throughput regressed by more than %d%%: %s" % (
+            args.threshold * 100, ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
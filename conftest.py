@@ -0,0 +1,7 @@
+import sys
+
+# async generators in the asyncio client tests are a syntax error
+# before Python 3.6
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_async.py')
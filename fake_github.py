@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+
+"""
+A local stand-in for github.com serving the test fixtures, to test and
+load test scraping paths end to end without network access.
+
+It serves:
+
+- user activity timeline pages, `/<user>?tab=overview&from=..&to=..`:
+    one month per page, chained with `data-url` cursors, for
+    `timeline_months` months back from the current one.
+    Records are taken from `fixtures/month`.
+- contributions calendar, `/users/<user>/contributions`:
+    `fixtures/calendar/contributions.html`
+- Atom activity feed, `/<user>` with `Accept: application/atom+xml`:
+    `fixtures/activity_feed/feed.xml` for the first `feed_pages` pages,
+    empty feed after that.
+- project contributors stats, `/<owner>/<repo>/graphs/contributors-data`:
+    synthetic JSON with `contributors` contributors and `weeks` weeks.
+    Like GitHub, the first `stats_warmup` requests for every repository
+    get an empty HTTP 202 response while the stats are "being computed".
+
+Failures are injected on demand, at random with the given probabilities:
+HTTP 429 (with a Retry-After header), HTTP 502 and empty 200 responses.
+Responses are delayed by `latency` seconds, and the server can also
+enforce its own rate limit, to measure rate limiter behavior:
+
+>>> with FakeGitHub(latency=0.05, error_rate=0.01,
+...                 rate_limit=(40, 60)) as server:  # doctest: +SKIP
+...     scraper = stgithub.Scraper()
+...     scraper.base_url = server.url
+...     rows = list(scraper.full_user_activity_timeline('user2589'))
+
+Fault settings are attributes of the server and can be changed while it is
+running. As a script, it serves until interrupted:
+
+    python fake_github.py --port 8000 --latency 0.1 --error-rate 0.05
+
+Requires Python 3.
+"""
+
+import argparse
+import calendar
+from collections import defaultdict, deque
+import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fixtures')
+
+_LISTING = '<div class="contribution-activity-listing'
+_HEADING_PATTERN = re.compile(
+    r'(<h3 class="profile-timeline-month-heading[^>]*>).*?(</h3>)', re.S)
+_PAGINATION_FORM = (
+    '<form class="ajax-pagination-form js-ajax-pagination '
+    'js-show-more-timeline-form col-10" data-url="%(url)s" '
+    'action="%(url)s&amp;include_header=no" method="get">%(button)s</form>')
+_SHOW_MORE_BUTTON = (
+    '<button type="submit" class="ajax-pagination-btn btn">'
+    'Show more activity</button>')
+_EMPTY_FEED = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<feed xmlns="http://www.w3.org/2005/Atom"></feed>\n')
+
+
+def _read(*path):
+    with open(os.path.join(FIXTURES_DIR, *path), 'rb') as fh:
+        return fh.read().decode('utf8')
+
+
+def _month_listings():
+    """ Get non-empty month listings from timeline fixtures, with
+    a placeholder for the month heading """
+    listings = []
+    dirname = os.path.join(FIXTURES_DIR, 'month')
+    for fname in sorted(os.listdir(dirname)):
+        if not fname.endswith('.html'):
+            continue
+        text = _read('month', fname)
+        # pagination form is generated for every page
+        text = text[:text.find('<!-- \'"` -->')]
+        for chunk in text.split(_LISTING)[1:]:
+            if 'profile-rollup-wrapper' not in chunk \
+                    or not _HEADING_PATTERN.search(chunk):
+                continue
+            listings.append(_LISTING + _HEADING_PATTERN.sub(
+                r'\1%(heading)s\2', chunk.replace('%', '%%'), count=1))
+    return listings
+
+
+def _add_months(year, month, delta):
+    month += delta - 1
+    return year + month // 12, month % 12 + 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'FakeGitHub/1.0'
+    # keep-alive, like github.com; all responses have Content-Length
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.github.count('connections')
+
+    def log_message(self, format, *args):
+        pass  # too noisy for load tests
+
+    def do_GET(self):
+        github = self.server.github
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        github.count('requests')
+
+        if github.latency:
+            time.sleep(github.latency)
+
+        retry_after = github.rate_limit_wait()
+        if retry_after is None and random.random() < github.rate_limited_rate:
+            retry_after = 1
+        if retry_after is not None:
+            return self.respond(429, b'', headers={
+                'Retry-After': str(int(retry_after + 0.999))})
+        if random.random() < github.error_rate:
+            return self.respond(502, b'Bad Gateway')
+        if random.random() < github.empty_rate:
+            return self.respond(200, b'')
+
+        path = url.path.strip('/').split('/')
+        if len(path) == 3 and path[0] == 'users' \
+                and path[2] == 'contributions':
+            return self.respond(200, github.calendar)
+        if len(path) == 4 and path[2:] == ['graphs', 'contributors-data']:
+            repo_slug = '/'.join(path[:2])
+            if github.warming_up(repo_slug):
+                return self.respond(202, b'')
+            return self.respond(200, github.contributors_data(repo_slug),
+                                'application/json')
+        if len(path) == 1 and path[0]:
+            if query.get('tab') == 'overview':
+                return self.respond(200, github.timeline_page(
+                    path[0], query.get('to')))
+            if 'atom' in self.headers.get('Accept', ''):
+                return self.respond(200, github.feed_page(
+                    int(query.get('page') or 0)), 'application/atom+xml')
+        return self.respond(404, b'Not Found')
+
+    def respond(self, status, body, content_type='text/html', headers=None):
+        if not isinstance(body, bytes):
+            body = body.encode('utf8')
+        self.server.github.count(status)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeGitHub(object):
+    """ Local HTTP server imitating github.com, see the module docstring
+
+    Args:
+        host (str): address to listen on
+        port (int): port to listen on, 0 to pick a free one. See `.url`
+        latency (float): delay before every response, seconds
+        error_rate (float): probability of HTTP 502 responses
+        rate_limited_rate (float): probability of HTTP 429 responses
+        empty_rate (float): probability of empty HTTP 200 responses
+        rate_limit (Tuple[int, float]): if set, respond with HTTP 429 to
+            requests exceeding this many requests per this many seconds
+        timeline_months (int): number of timeline pages per user
+        feed_pages (int): number of non-empty Atom feed pages
+        contributors (int): number of contributors in project stats
+        weeks (int): number of weeks in project stats
+        stats_warmup (int): number of empty HTTP 202 responses to project
+            stats requests before the stats are "computed", per repository
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0, error_rate=0,
+                 rate_limited_rate=0, empty_rate=0, rate_limit=None,
+                 timeline_months=24, feed_pages=2, contributors=20, weeks=100,
+                 stats_warmup=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limited_rate = rate_limited_rate
+        self.empty_rate = empty_rate
+        self.rate_limit = rate_limit
+        self.timeline_months = timeline_months
+        self.feed_pages = feed_pages
+        self.contributors = contributors
+        self.weeks = weeks
+        self.stats_warmup = stats_warmup
+        self.stats_requests = defaultdict(int)  # by repository
+
+        self.listings = _month_listings()
+        self.calendar = _read('calendar', 'contributions.html')
+        self.feed = _read('activity_feed', 'feed.xml')
+        # connections, requests, responses by status
+        self.stats = defaultdict(int)
+        self.lock = threading.Lock()
+        self.timestamps = deque()
+
+        self.httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.github = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        """ Serve requests in a background thread """
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def rate_limit_wait(self):
+        """ Register a request against the server rate limit
+
+        Returns:
+            Optional[float]: seconds until the request would be allowed,
+                or None if it is allowed now
+        """
+        if not self.rate_limit:
+            return None
+        max_requests, window = self.rate_limit
+        now = time.time()
+        with self.lock:
+            while self.timestamps and self.timestamps[0] <= now - window:
+                self.timestamps.popleft()
+            if len(self.timestamps) >= max_requests:
+                return self.timestamps[0] + window - now
+            self.timestamps.append(now)
+        return None
+
+    def timeline_page(self, user, to=None):
+        """ Get one month of the user timeline, the month of `to` date """
+        today = datetime.date.today()
+        try:
+            year, month = int(to[:4]), int(to[5:7])
+        except (TypeError, ValueError):
+            year, month = today.year, today.month
+        age = (today.year - year) * 12 + today.month - month
+        listing = self.listings[age % len(self.listings)] % {
+            'heading': '%s <span class="text-gray">%d</span>' % (
+                calendar.month_name[month], year)}
+        prev_year, prev_month = _add_months(year, month, -1)
+        url = '/%s?tab=overview&amp;from=%d-%02d-01&amp;to=%d-%02d-%02d' % (
+            user, prev_year, prev_month, prev_year, prev_month,
+            calendar.monthrange(prev_year, prev_month)[1])
+        button = _SHOW_MORE_BUTTON if age < self.timeline_months - 1 else ''
+        return listing + _PAGINATION_FORM % {'url': url, 'button': button}
+
+    def feed_page(self, page):
+        # the first page is requested without the page parameter, then 1, 2..
+        if page < self.feed_pages:
+            return self.feed
+        return _EMPTY_FEED
+
+    def warming_up(self, repo_slug):
+        """ Check if project stats are not "computed" yet """
+        with self.lock:
+            self.stats_requests[repo_slug] += 1
+            return self.stats_requests[repo_slug] <= self.stats_warmup
+
+    def contributors_data(self, repo_slug):
+        # deterministic for the same repository
+        rnd = random.Random(repo_slug)
+        start = 1230940800  # Sunday, January 3, 2009
+        stats = []
+        for i in range(self.contributors):
+            weeks = [{'w': start + week * 7 * 24 * 3600,
+                      'a': rnd.randint(0, 500), 'd': rnd.randint(0, 200),
+                      'c': rnd.randint(0, 10)} for week in range(self.weeks)]
+            stats.append({
+                'total': sum(week['c'] for week in weeks),
+                'weeks': weeks,
+                'author': {'login': 'contributor%d' % i, 'id': i + 1}})
+        return json.dumps(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for github.com")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', default=8000, type=int)
+    parser.add_argument('--latency', default=0, type=float,
+                        help="Response delay, seconds")
+    parser.add_argument('--error-rate', default=0, type=float,
+                        help="Probability of HTTP 502 responses")
+    parser.add_argument('--rate-limited-rate', default=0, type=float,
+                        help="Probability of HTTP 429 responses")
+    parser.add_argument('--empty-rate', default=0, type=float,
+                        help="Probability of empty responses")
+    parser.add_argument('--rate-limit', nargs=2, type=float,
+                        metavar=('REQUESTS', 'SECONDS'),
+                        help="Respond with HTTP 429 to requests exceeding "
+                             "this rate")
+    parser.add_argument('--timeline-months', default=24, type=int,
+                        help="Timeline pages per user, default: %(default)s")
+    parser.add_argument('--stats-warmup', default=0, type=int,
+                        help="Empty responses to project stats requests "
+                             "before the stats are ready, default: %(default)s")
+    args = parser.parse_args()
+
+    server = FakeGitHub(
+        args.host, args.port, args.latency, args.error_rate,
+        args.rate_limited_rate, args.empty_rate, args.rate_limit,
+        args.timeline_months, stats_warmup=args.stats_warmup)
+    print("Serving on %s" % server.url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(dict(server.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,9 +5,9 @@ from setuptools import setup
 
 # get author, version and license from package files
 # since it has some not yet installed dependencies, parsing the file:
-head = open('stgithub.py').read(2048)
+source = open('stgithub.py').read()
 pattern = r"""__%s__\s*=\s*['"]([^'"]*)['"]"""
-kwargs = {keyword: re.search(pattern % keyword, head).group(1)
+kwargs = {keyword: re.search(pattern % keyword, source).group(1)
           for keyword in ('version', 'author', 'license')}
 
 requirements = [
@@ -15,6 +15,13 @@ requirements = [
     for line in open('requirements.txt')
     if line.strip() and not line.strip().startswith('#')]
 
+# optional features: compact calendars and columnar contributor stats
+# need NumPy, DataFrames of user timelines also need pandas
+extras = {
+    'compact': ['numpy'],
+    'frame': ['numpy', 'pandas'],
+}
+
 # options reference: https://docs.python.org/2/distutils/
 # see also: https://packaging.python.org/tutorials/distributing-packages/
 setup(
@@ -36,8 +43,11 @@ setup(
     ],
     platforms=["Linux", "Solaris", "Mac OS-X", "Unix", "Windows"],
     python_requires='>2.6, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, <4',
-    py_modules=['stgithub'],
+    # stgithub_async requires Python 3.6+; it is shipped to all versions
+    # since the wheel is universal, but only imported on demand
+    py_modules=['stgithub', 'stgithub_async'],
     url='https://github.com/cmustrudel/strudel.ghutils',
     install_requires=requirements,
+    extras_require=extras,
     **kwargs
 )
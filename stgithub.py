@@ -22,29 +22,70 @@ This includes:
 
 
 .. autoclass:: Scraper
-    :members: full_user_activity_timeline, project_contributor_stats,
-        user_daily_contrib_num, links_to_recent_user_activity
+    :members: full_user_activity_timeline, full_user_activity_timeline_frame,
+        project_contributor_stats, user_daily_contrib_num,
+        user_daily_contrib_range,
+        links_to_recent_user_activity, bulk_user_activity_timeline,
+        map, add_identity
+
+.. autoclass:: ResponseCache
+
+.. autoclass:: TimelineCheckpoint
+
+.. autoclass:: ContributorStatsHarvester
+    :members: harvest, load, statuses
+
+.. autoclass:: TimelineWriter
+    :members: write
+
+.. autoclass:: ActivityRow
+    :members: from_dict
+
+.. autoclass:: RateLimiter
+
+.. autoclass:: Metrics
+    :members: add_hook, prometheus
+
+.. autofunction:: register_record_handler
 
 """
 
 from __future__ import print_function
 
 import argparse
-from collections import defaultdict
+import array
+import bisect
+import csv
+from collections import OrderedDict, defaultdict, deque, namedtuple
 import datetime
-from functools import wraps
+import email.utils
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import os
+import random
 import re
+import sys
+import sqlite3
 import threading
 import time
+import types
 import warnings
-from xml.etree import ElementTree
+from multiprocessing.pool import ThreadPool
+
+try:
+    from html import unescape
+except ImportError:  # Python 2
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
 
-from bs4 import BeautifulSoup
-import feedparser
-import pandas as pd
+# bs4, lxml, numpy and pandas are slow to import;
+# they are imported lazily, only when used
 import requests
-import six  # Queue
+import six
 
 __version__ = '0.1.0'
 __author__ = "Marat (@cmu.edu)"
@@ -65,12 +106,41 @@ HEADERS = {   # browser headers for non-API URLs
     "Connection": "keep-alive",
     "Cache-Control": 'max-age=0',
 }
+# number of full weeks shown in the contributions calendar before the week
+# of the requested date. Weeks start on Sunday.
+CALENDAR_WEEKS = 52
+# HTML parser backend used to parse timeline pages and Atom feed chunks:
+# - 'html.parser': BeautifulSoup with pure Python parser, always available
+# - 'lxml': BeautifulSoup with lxml parser, faster; requires lxml
+# - 'lxml.html': plain lxml tree, several times faster; requires lxml
+HTML_PARSER = 'html.parser'
+# high resolution timer for request latency
+_timer = getattr(time, 'perf_counter', time.time)
+# default time to live of cached responses, in seconds, by URL pattern.
+# The first matching pattern is used; responses to other URLs are always
+# revalidated. See ResponseCache
+CACHE_TTL = (
+    (r'/graphs/contributors-data', 7 * 24 * 3600),
+    (r'/users/[^/]+/contributions', 24 * 3600),
+    (r'[?&]tab=overview', 24 * 3600),
+)
+# activity counters of timeline rows, in the output order. See TimelineWriter
+COLUMNS = ('commits', 'issues', 'pull_requests', 'reviews',
+           'private_contrib', 'created_repository', 'joined_org')
 
 
 class GitHubScrapingError(requests.HTTPError):
     pass
 
 
+# English month names and abbreviations used by GitHub, e.g. "December 2018"
+MONTHS = {}
+for _i, _month_name in enumerate((
+        'January', 'February', 'March', 'April', 'May', 'June', 'July',
+        'August', 'September', 'October', 'November', 'December')):
+    MONTHS[_month_name] = MONTHS[_month_name[:3]] = _i + 1
+
+
 def normalize_text(string):
     # type: (six.string_types) -> six.string_types
     """ Normalize spaces and newlines
@@ -90,6 +160,51 @@ def _int(value):
     return int(value)
 
 
+def parse_month(heading):
+    # type: (six.string_types) -> six.string_types
+    """ Parse timeline month heading into %Y-%m format
+
+    >>> parse_month("December 2018")
+    '2018-12'
+    >>> parse_month(" March\\n 2005 ")
+    '2005-03'
+    """
+    chunks = heading.split()
+    try:
+        return '%s-%02d' % (int(chunks[-1]), MONTHS[chunks[0]])
+    except (IndexError, KeyError):
+        raise ValueError("Unexpected month heading: %s" % heading)
+
+
+def parse_date(value):
+    # type: (Union[str, datetime.date]) -> datetime.date
+    """ Parse a date, as used in this module arguments and GitHub pages
+
+    Supported formats: %Y-%m-%d, %Y-%m (the 1st day of the month) and
+    GitHub's "Jan 9, 2019". datetime.date and datetime.datetime objects
+    are returned as is.
+
+    >>> parse_date("2017-01")
+    datetime.date(2017, 1, 1)
+    >>> parse_date("Jan 9, 2019")
+    datetime.date(2019, 1, 9)
+    """
+    if isinstance(value, datetime.date):
+        return value
+    value = value.strip()
+    for fmt in ('%Y-%m-%d', '%Y-%m'):
+        try:
+            return datetime.datetime.strptime(value[:10], fmt).date()
+        except ValueError:
+            continue
+    # GitHub omits the year for recent dates, e.g. "Jan 9"
+    match = re.match(r'([A-Z][a-z]+)\.? (\d{1,2})(?:,? (\d{4}))?$', value)
+    if match and match.group(1) in MONTHS:
+        year = int(match.group(3) or datetime.date.today().year)
+        return datetime.date(year, MONTHS[match.group(1)], int(match.group(2)))
+    raise ValueError("Unexpected date format: %s" % value)
+
+
 def extract_repo(link):
     # type: (six.string_types) -> six.string_types
     """ Extract repository slug from a GitHub link
@@ -102,6 +217,259 @@ def extract_repo(link):
     return "/".join(link.strip("/").split("/", 2)[:2])
 
 
+class _LxmlTag(object):
+    """ A subset of BeautifulSoup Tag interface on top of an lxml element,
+    just enough for the parsers in this module.
+    See HTML_PARSER for details """
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def __getattr__(self, name):
+        # tag.button, tag.h4 etc. - first descendant with this tag name
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.find(name)
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        # number of child nodes, like len(bs4_tag.contents)
+        element = self.element
+        return bool(element.text) + sum(1 + bool(child.tail) for child in element)
+
+    def __getitem__(self, key):
+        value = self.element.attrib[key]
+        # class is a multi-valued attribute in BeautifulSoup
+        return value.split() if key == 'class' else value
+
+    def __str__(self):
+        from lxml import html
+        return html.tostring(self.element, encoding='unicode')
+
+    @property
+    def attrs(self):
+        return {key: self[key] for key in self.element.attrib}
+
+    @property
+    def text(self):
+        return self.element.text_content()
+
+    def get(self, key, default=None):
+        return self[key] if key in self.element.attrib else default
+
+    def find(self, name):
+        for element in self.element.iterdescendants(name):
+            return _LxmlTag(element)
+        return None
+
+    def find_all(self, name, class_=None, attrs=None, recursive=True):
+        if recursive:
+            elements = self.element.iterdescendants(name)
+        else:
+            elements = self.element.iterchildren(name)
+        result = []
+        for element in elements:
+            if class_ is not None and \
+                    class_ not in element.get('class', '').split():
+                continue
+            if attrs and any(element.get(attr) != value
+                             for attr, value in attrs.items()):
+                continue
+            result.append(_LxmlTag(element))
+        return result
+
+    def prettify(self):
+        from lxml import html
+        return html.tostring(self.element, encoding='unicode',
+                             pretty_print=True)
+
+
+def _soup(text):
+    # type: (Union[str, bytes]) -> BeautifulSoup
+    """ Parse HTML using HTML_PARSER backend
+
+    Returns:
+        Union[BeautifulSoup, _LxmlTag]: BeautifulSoup-like document tree
+    """
+    if HTML_PARSER != 'lxml.html':
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(text, HTML_PARSER)
+    from lxml import html
+    if isinstance(text, bytes):
+        text = text.decode('utf8')
+    if not text.strip():
+        # unlike BeautifulSoup, lxml.html raises on empty documents,
+        # e.g. empty responses GitHub sometimes returns
+        text = '<html></html>'
+    return _LxmlTag(html.document_fromstring(text))
+
+
+# Timeline record handlers, by record kind:
+# 'button' - rollup records, e.g. "Created 5 commits in 2 repositories"
+# 'h4' - single event records, e.g. "Created an issue in org/repo"
+# 'private' - private contributions, e.g. "19 contributions in private ..."
+# Each kind has a list of (title pattern, handler), in the order of priority
+RECORD_HANDLERS = {'button': [], 'h4': [], 'private': []}
+# compiled dispatch patterns, built lazily from RECORD_HANDLERS
+_RECORD_DISPATCH = {}
+
+
+def register_record_handler(kind, pattern):
+    """ Register a handler for a type of timeline records
+
+    Handlers are called as `handler(record_div, title, record_data)`, where
+    `title` is the normalized record title and `record_data` is a
+    `defaultdict` of `defaultdict(int)` to populate:
+    `record_data[repo][activity] = <number>`.
+
+    Args:
+        kind (str): 'button', 'h4' or 'private', see RECORD_HANDLERS
+        pattern (str): regex matching the record title from the beginning.
+            Handlers registered earlier take precedence.
+
+    >>> @register_record_handler('h4', r'Starred a repository')
+    ... def _record_starred(record_div, title, record_data):
+    ...     record_data[record_div.h4.a.text]['stars'] += 1
+    """
+    def decorator(handler):
+        RECORD_HANDLERS[kind].append((pattern, handler))
+        _RECORD_DISPATCH.pop(kind, None)
+        return handler
+    return decorator
+
+
+def _record_handler(kind, title):
+    """ Find a handler for a timeline record by its title, in one regex match
+
+    Returns:
+        Optional[callable]: the handler, or None if there is no match
+    """
+    dispatch = _RECORD_DISPATCH.get(kind)
+    if dispatch is None:
+        dispatch = _RECORD_DISPATCH[kind] = re.compile("|".join(
+            "(?P<h%d>%s)" % (i, pattern)
+            for i, (pattern, _) in enumerate(RECORD_HANDLERS[kind])))
+    match = dispatch.match(title)
+    if not match:
+        return None
+    # lastgroup is the outermost group of the matched alternative
+    return RECORD_HANDLERS[kind][int(match.lastgroup[1:])][1]
+
+
+def _count_rollup(record_div, record_data, activity):
+    """ Count issues or pull requests in a rollup record """
+    for repo_div in record_div.find_all(
+            'div', class_='profile-rollup-summarized'):
+        repo_div_button = repo_div.button
+        if not repo_div_button:
+            # "N repositories not shown"
+            continue
+        repo = repo_div_button.div.span.text.strip()
+        count = 0
+        count_span = repo_div_button.find_all('span', recursive=False)[0]
+        for span in count_span.find_all('span'):
+            count += _int(span.text)
+        record_data[repo][activity] += count
+
+
+@register_record_handler(
+    'button', r'Reviewed \d[\d,]* pull requests? in \d+ repositor(?:y|ies)')
+def _record_reviews(record_div, title, record_data):
+    for repo_div in record_div.find_all(
+            'div', class_='profile-rollup-summarized'):
+        repo_div_button = repo_div.button
+        if not repo_div_button:
+            # "N repositories not shown"
+            continue
+        repo_span, count_span = repo_div_button.find_all('span')
+        repo = repo_span.text.strip()
+        count = _int(count_span.text.split()[0])
+        record_data[repo]['reviews'] += count
+
+
+@register_record_handler(
+    'button', r'Opened \d[\d,]* (?:other )?issues? in \d+ repositor(?:y|ies)')
+def _record_issues(record_div, title, record_data):
+    _count_rollup(record_div, record_data, 'issues')
+
+
+@register_record_handler(
+    'button', r'Created \d[\d,]*\+? (?:other )?repositor(?:y|ies)')
+def _record_repositories(record_div, title, record_data):
+    # e.g. Created 100+ repositories
+    for link in record_div.find_all(
+            'a', attrs={'data-hovercard-type': "repository"}):
+        record_data[link.text]['created_repository'] = 1
+
+
+@register_record_handler(
+    'button', r'Opened \d[\d,]* (?:other )?pull requests? '
+              r'in \d+ repositor(?:y|ies)')
+def _record_pull_requests(record_div, title, record_data):
+    _count_rollup(record_div, record_data, 'pull_requests')
+
+
+@register_record_handler(
+    'button', r'Created \d[\d,]* commits? in \d+ repositor(?:y|ies)')
+def _record_commits(record_div, title, record_data):
+    for repo_li in record_div.ul.find_all('li', recursive=False):
+        li_div = repo_li.div
+        if not li_div:
+            continue  # "N repositories not shown"
+        repo_link = li_div.find_all('a', recursive=False)[1]
+        repo = extract_repo(repo_link["href"])
+        count = _int(repo_link.text.strip().split(" ")[0])
+        record_data[repo]['commits'] += count
+
+
+def _h4_repo(record_div):
+    return record_div.h4.a and record_div.h4.a.text
+
+
+@register_record_handler('h4', r'Created an issue in')
+@register_record_handler('h4', r'Opened their first issue on GitHub in')
+def _record_issue(record_div, title, record_data):
+    record_data[_h4_repo(record_div)]['issues'] += 1
+
+
+@register_record_handler('h4', r'Joined the')
+def _record_joined_org(record_div, title, record_data):
+    record_data[record_div.a['href'].strip('/')]['joined_org'] = 1
+
+
+@register_record_handler('h4', r'Created a pull request in')
+@register_record_handler('h4', r'Opened their first pull request on GitHub in')
+def _record_pull_request(record_div, title, record_data):
+    # fist PR in a given month
+    record_data[_h4_repo(record_div)]['pull_requests'] += 1
+
+
+@register_record_handler('h4', r'Joined GitHub$')
+def _record_joined_github(record_div, title, record_data):
+    pass
+
+
+@register_record_handler('h4', r'Created their first repository')
+def _record_first_repository(record_div, title, record_data):
+    links = record_div.find_all(
+        'a', attrs={'data-hovercard-type': "repository"})
+    if not links:  # private repository
+        repo = ''
+    else:
+        repo = extract_repo(links[0].get('href'))
+    record_data[repo]['created_repository'] = 1
+
+
+@register_record_handler('private', r'.* in private repositories$')
+def _record_private(record_div, title, record_data):
+    record_data[None]['private_contrib'] += _int(title.split(" ", 1)[0])
+
+
 def _parse_timeline_update_record(record_div):
     # type(BeautifulSoup) -> dict
     """
@@ -119,6 +487,8 @@ def _parse_timeline_update_record(record_div):
                 'created_repository': {0|1},
             }
         }
+
+    Records are classified by title, see register_record_handler()
     """
     # Note: GitHub lists only first 25 repos for each activity
     # data[repo][activity] = <number>
@@ -128,110 +498,26 @@ def _parse_timeline_update_record(record_div):
     if record_div.button:
         # created commits, repositories, issues,
         # reviewed pull requests
+        kind = 'button'
         title = normalize_text(record_div.button.text)
-        if re.match(
-                r'Reviewed \d[\d,]* pull requests? in \d+ repositor(y|ies)', title):
-
-            for repo_div in record_div.find_all(
-                    'div', class_='profile-rollup-summarized'):
-                repo_div_button = repo_div.button
-                if not repo_div_button:
-                    # "N repositories not shown"
-                    continue
-                repo_span, count_span = repo_div_button.find_all('span')
-                repo = repo_span.text.strip()
-                count = _int(count_span.text.split()[0])
-                record_data[repo]['reviews'] += count
-
-        elif re.match(r'Opened \d[\d,]* (?:other )?issues? in \d+ repositor(y|ies)',
-                      title):
-            for repo_div in record_div.find_all(
-                    'div', class_='profile-rollup-summarized'):
-                repo_div_button = repo_div.button
-                if not repo_div_button:
-                    # "N repositories not shown"
-                    continue
-                repo = repo_div_button.div.span.text.strip()
-                count = 0
-                count_span = repo_div.button.find_all(
-                    'span', recursive=False)[0]
-                for span in count_span.find_all('span'):
-                    count += _int(span.text)
-                record_data[repo]['issues'] += count
-
-        elif re.match(r'Created \d[\d,]*\+? (?:other )?repositor(y|ies)', title):
-            # e.g. Created 100+ repositories
-            for link in record_div.find_all(
-                    'a', attrs={'data-hovercard-type': "repository"}):
-                record_data[link.text]['created_repository'] = 1
-
-        elif re.match(r'Opened \d[\d,]* (?:other )?pull requests? '
-                      r'in \d+ repositor(y|ies)', title):
-            for repo_div in record_div.find_all(
-                    'div', class_='profile-rollup-summarized'):
-                repo_div_button = repo_div.button
-                if not repo_div_button:
-                    # "N repositories not shown"
-                    continue
-                repo = repo_div_button.div.span.text.strip()
-                count = 0
-                count_span = repo_div.button.find_all('span', recursive=False)[
-                    0]
-                for span in count_span.find_all('span'):
-                    count += _int(span.text)
-                record_data[repo]['pull_requests'] += count
-
-        elif re.match(r'Created \d[\d,]* commits? in \d+ repositor(y|ies)', title):
-            for repo_li in record_div.ul.find_all('li', recursive=False):
-                li_div = repo_li.div
-                if not li_div:
-                    continue  # "N repositories not shown"
-                repo_link = li_div.find_all('a', recursive=False)[1]
-                repo = extract_repo(repo_link["href"])
-                count = _int(repo_link.text.strip().split(" ")[0])
-                record_data[repo]['commits'] += count
-
-        else:
-            raise ValueError("Unexpected title: %s\n%s"
-                             "" % (title, str(record_div)))
-
     elif record_div.h4:
+        kind = 'h4'
         title = normalize_text(record_div.h4.text)
-        repo = record_div.h4.a and record_div.h4.a.text
-        if title.startswith("Created an issue in"):
-            record_data[repo]['issues'] += 1
-        elif title.startswith("Joined the"):
-            record_data[record_div.a['href'].strip('/')]['joined_org'] = 1
-        elif title.startswith("Created a pull request in"):
-            # fist PR in a given month
-            record_data[repo]['pull_requests'] += 1
-        elif title == "Joined GitHub":
-            pass
-        elif title.startswith("Opened their first issue on GitHub in"):
-            record_data[repo]['issues'] += 1
-        elif title.startswith("Opened their first pull request on GitHub in"):
-            record_data[repo]['pull_requests'] += 1
-        elif title.startswith("Created their first repository"):
-            links = record_div.find_all(
-                'a', attrs={'data-hovercard-type': "repository"})
-            if not links:  # private repository
-                repo = ''
-            else:
-                repo = extract_repo(links[0].get('href'))
-            record_data[repo]['created_repository'] = 1
-        else:
-            raise ValueError("Unexpected title: " + title)
-
     elif len(record_div.span) == 3:
         # private activity
+        kind = 'private'
         title = normalize_text(record_div.find_all('span')[1].text)
-        if title.endswith(' in private repositories'):
-            record_data[None]['private_contrib'] += _int(title.split(" ", 1)[0])
-        else:
-            raise ValueError("Unexpected title: " + title)
     else:
         raise ValueError("Unexpected activity:" + str(record_div))
 
+    handler = _record_handler(kind, title)
+    if handler is None:
+        if kind == 'button':
+            raise ValueError("Unexpected title: %s\n%s"
+                             "" % (title, str(record_div)))
+        raise ValueError("Unexpected title: " + title)
+    handler(record_div, title, record_data)
+
     # convert defaultdict to dict
     return {rep: dict(activities) for rep, activities in record_data.items()}
 
@@ -281,26 +567,25 @@ def _parse_timeline_update(bs4_tree):
                 # we might have several activities in the same record repository
                 # in a given month, e.g. issues, PRs and commits
                 month_data[record_repo].update(record_activity)
-            record_month = record_month or pd.to_datetime(
-                month_div.h3.text.strip()).strftime('%Y-%m')
+            record_month = record_month or parse_month(month_div.h3.text)
         if month_data:
             yield record_month, month_data
 
 
 def _extract_activity_feed_links(text):
-    tree = BeautifulSoup(text, 'html.parser')
+    tree = _soup(text)
 
     date = None
     for span in tree.find_all('span'):
         if 'f6' not in span['class']:
             continue
         try:
-            date = pd.to_datetime(span.text.strip()).strftime("%Y-%m-%d")
+            date = parse_date(span.text).strftime("%Y-%m-%d")
         except ValueError:
             continue
         break
 
-    links = []
+    links = set()
     for link in tree.find_all('a'):
         href = link.get('href', '')
         chunks = href.split("/")
@@ -310,23 +595,1310 @@ def _extract_activity_feed_links(text):
                 chunks[3] not in ('commit', 'issue', 'tree'):
             continue
         if href not in links:
-            links.append(href)
+            links.add(href)
             yield (date, href)
 
 
-def guard(func):
-    # TODO: once released in stutils, reuse from there
-    semaphore = threading.Lock()
+_ATOM_NS = '{http://www.w3.org/2005/Atom}'
 
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        semaphore.acquire()
+
+def _iter_activity_feed(chunks, counter=None):
+    # type: (Iterable[Union[str, bytes]], dict) -> Generator[Tuple[str, str]]
+    """ Parse the user Atom feed incrementally, entry by entry
+
+    Entries are handled as soon as they are received and discarded after
+    that, so memory use does not depend on the feed size.
+
+    Args:
+        chunks (Iterable[Union[str, bytes]]): feed XML, in chunks of any size
+        counter (dict): if given, counter['entries'] is incremented for every
+            entry, including entries without links (e.g. stars or forks).
+            It tells a page of such events from the end of the feed.
+
+    Yields:
+        Tuple[str, str]: (<%Y-%m-%d date>, link) tuples, see
+            _extract_activity_feed_links()
+    """
+    from xml.etree import ElementTree
+    parser = getattr(ElementTree, 'XMLPullParser', None)
+    if parser is None:  # Python 2
+        events = ElementTree.fromstring(b''.join(chunks)).iter(
+            _ATOM_NS + 'entry')
+        chunks = ()
+    else:
+        parser = parser(events=('end',))
+        events = ()
+
+    def entries():
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if element.tag == _ATOM_NS + 'entry':
+                    yield element
+        for element in events:
+            yield element
+
+    for entry in entries():
+        if counter is not None:
+            counter['entries'] = counter.get('entries', 0) + 1
+        for content in entry.iter(_ATOM_NS + 'content'):
+            if content.text:
+                for date, link in _extract_activity_feed_links(content.text):
+                    yield date, link
+        entry.clear()
+
+
+def _parse_activity_feed(text):
+    """ Parse one page of the user Atom feed
+
+    Returns:
+        List[Tuple[str, str]]: (<%Y-%m-%d date>, link) tuples. Note that
+            the list is also empty if entries on the page have no links.
+    """
+    return list(_iter_activity_feed([text]))
+
+
+class _BoundedSet(object):
+    """ A set remembering only `maxlen` most recently added items """
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self.items = set()
+        self.order = deque()
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item in self.items:
+            return
+        self.items.add(item)
+        self.order.append(item)
+        if len(self.order) > self.maxlen:
+            self.items.discard(self.order.popleft())
+
+
+# day cells of the contributions calendar, e.g.:
+# <rect class="day" ... data-count="0" data-date="2018-01-01"/>
+_RECT_PATTERN = re.compile(r'<rect\s([^>]*)>')
+
+
+def _iter_contrib_calendar(text):
+    # type: (str) -> Generator[Tuple[str, int]]
+    """ Scan contributions calendar, as returned by /users/<user>/contributions,
+    for day cells, without building a document tree.
+
+    Yields:
+        Tuple[str, int]: (%Y-%m-%d date, number of contributions)
+    """
+    # only first <svg> element is considered,
+    # since HTML outside of it is sometimes malformed
+    start = text.find('<svg')
+    end = text.find('/svg>', start)
+    if start < 0 or end < 0:
+        return
+    for match in _RECT_PATTERN.finditer(text, start, end):
+        # plain string search is several times faster than
+        # regex attribute matching or building a tree
+        tag = ' ' + match.group(1)
+        if ' class="day"' not in tag:
+            continue
+        date_start = tag.find(' data-date="') + 12
+        if date_start < 12:
+            continue
+        count_start = tag.find(' data-count="') + 13
+        count = 0
+        if count_start >= 13:
+            count = int(tag[count_start:tag.find('"', count_start)])
+        yield tag[date_start:tag.find('"', date_start)], count
+
+
+def _compact_contrib_calendar(days):
+    # type: (Iterable[Tuple[str, int]]) -> tuple
+    """ Convert (date, count) pairs into a start date and an array of counts
+
+    Returns:
+        Tuple[Optional[datetime.date], numpy.ndarray]: the first date,
+            or None if there are no days, and int32 array of daily counts
+            starting from this date. Days missing in the input are zeros.
+    """
+    import numpy as np
+    days = list(days)
+    if not days:
+        return None, np.zeros(0, dtype=np.int32)
+    dates = np.array([date for date, _ in days], dtype='datetime64[D]')
+    start = dates.min()
+    offsets = (dates - start).astype(int)
+    counts = np.zeros(offsets.max() + 1, dtype=np.int32)
+    counts[offsets] = [count for _, count in days]
+    return start.item(), counts
+
+
+def _parse_contrib_calendar(text, year, compact=False):
+    # type: (str, int, bool) -> Union[dict, tuple]
+    """ Parse contributions calendar, as returned by
+    /users/<user>/contributions, for the given year.
+
+    Returns:
+        Union[dict, tuple]: a {date: count} dictionary,
+            or output of _compact_contrib_calendar() if `compact` is True
+    """
+    year = str(year)
+    days = ((date, count) for date, count in _iter_contrib_calendar(text)
+            if date.startswith(year))
+    if compact:
+        return _compact_contrib_calendar(days)
+    return dict(days)
+
+
+def _calendar_first_day(to_date):
+    # type: (datetime.date) -> datetime.date
+    """ Get the first day shown in the calendar ending on `to_date`
+
+    >>> _calendar_first_day(datetime.date(2018, 12, 31))  # Monday
+    datetime.date(2017, 12, 31)
+    """
+    days_since_sunday = to_date.isoweekday() % 7
+    return to_date - datetime.timedelta(
+        days=days_since_sunday + CALENDAR_WEEKS * 7)
+
+
+def _plan_contrib_requests(start, end):
+    # type: (datetime.date, datetime.date) -> list
+    """ Get the smallest set of calendar requests covering a date range.
+    Each calendar covers 365 to 371 days ending on its `to` date,
+    see _calendar_first_day().
+
+    Returns:
+        List[Tuple[datetime.date, datetime.date]]: (from, to) date pairs,
+            most recent first. The ranges are adjacent and do not overlap.
+
+    >>> _plan_contrib_requests(datetime.date(2017, 6, 1),
+    ...                        datetime.date(2018, 12, 31))
+    [(datetime.date(2017, 12, 31), datetime.date(2018, 12, 31)), \
+(datetime.date(2017, 6, 1), datetime.date(2017, 12, 30))]
+    """
+    ranges = []
+    to_date = end
+    while to_date >= start:
+        from_date = max(start, _calendar_first_day(to_date))
+        ranges.append((from_date, to_date))
+        to_date = from_date - datetime.timedelta(days=1)
+    return ranges
+
+
+def _contrib_range_url(user, from_date, to_date):
+    # type: (str, datetime.date, datetime.date) -> str
+    return "/users/%s/contributions?from=%s&to=%s&full_graph=1" % (
+        user, from_date.isoformat(), to_date.isoformat())
+
+
+def _parse_contrib_range(text, from_date, to_date):
+    # type: (str, datetime.date, datetime.date) -> list
+    """ Get (date, count) pairs within the given range from a calendar """
+    from_date = from_date.isoformat()
+    to_date = to_date.isoformat()
+    return [(date, count) for date, count in _iter_contrib_calendar(text)
+            if from_date <= date <= to_date]
+
+
+def _parse_timeline_page(text, start=None):
+    # type: (str, str) -> tuple
+    """ Parse one page of the user activity timeline
+
+    Args:
+        text (str): page HTML
+        start (str): %Y-%m formatted month to stop at, if any
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: a list of activity dictionaries,
+            see Scraper.full_user_activity_timeline(), and the URL of the
+            next page. The URL is None if it is the last page
+            or the `start` month is reached.
+    """
+    soup = _soup(text)
+    rows = []
+    for month_div in soup.find_all('div', class_='contribution-activity-listing'):
+        for month, data in _parse_timeline_update(month_div):
+            if start and month < start:
+                return rows, None
+            for repo, activity in data.items():
+                activity['repo'] = repo
+                activity['month'] = month
+                rows.append(activity)
+    form = soup.form
+    next_url = None
+    if form and form.button:
+        next_url = form.attrs['data-url']
+    return rows, next_url
+
+
+# beginning of a month in timeline pages
+_LISTING_MARKER = '<div class="contribution-activity-listing'
+
+
+def _iter_text(response, chunk_size=16384):
+    # type: (requests.Response, int) -> Generator[str]
+    """ Iterate over decoded response body chunks, as they arrive """
+    if response.encoding is None:
+        response.encoding = 'utf8'
+    return response.iter_content(chunk_size, decode_unicode=True)
+
+
+def _parse_timeline_stream(chunks, start=None):
+    # type: (Iterable[str], str) -> tuple
+    """ Parse a timeline page incrementally, as it is being downloaded
+
+    Every month is parsed as soon as it is received, so only one month,
+    rather than the full page and its parsed tree, is held in memory.
+    Once the `start` month is reached, the rest of the page is not read.
+
+    Args:
+        chunks (Iterable[str]): page HTML, in chunks of any size
+        start (str): %Y-%m formatted month to stop at, if any
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: same as _parse_timeline_page()
+    """
+    rows = []
+    buf = ''
+    # position of the current month in buf, -1 if it has not started yet
+    listing_start = -1
+
+    def parse_listing(text):
+        for month, data in _parse_timeline_update(_soup(text)):
+            if start and month < start:
+                return False
+            for repo, activity in data.items():
+                activity['repo'] = repo
+                activity['month'] = month
+                rows.append(activity)
+        return True
+
+    for chunk in chunks:
+        # the marker might be split between chunks
+        offset = max(len(buf) - len(_LISTING_MARKER), 0)
+        buf += chunk
+        while True:
+            pos = buf.find(_LISTING_MARKER, max(offset, listing_start + 1))
+            if pos < 0:
+                break
+            if listing_start >= 0 and not parse_listing(
+                    buf[listing_start:pos]):
+                return rows, None
+            buf = buf[pos:]
+            listing_start = 0
+            offset = 1
+        if listing_start < 0:
+            # no months yet; keep the pagination form if it has started,
+            # otherwise only what might be a partial marker
+            form_start = buf.find('<form')
+            buf = buf[form_start:] if form_start >= 0 \
+                else buf[-len(_LISTING_MARKER):]
+
+    if listing_start >= 0:
+        form = _FORM_PATTERN.search(buf)
+        if not parse_listing(buf[:form.start()] if form else buf):
+            return rows, None
+    return rows, _next_timeline_url(buf, start)
+
+
+# opening tag of the timeline pagination form
+_FORM_PATTERN = re.compile(r'<form\b[^>]*>')
+_DATA_URL_PATTERN = re.compile(r'\sdata-url="([^"]*)"')
+_TO_MONTH_PATTERN = re.compile(r'[?&]to=(\d{4}-\d{2})')
+
+
+def _next_timeline_url(text, start=None):
+    # type: (str, str) -> Optional[str]
+    """ Get the next timeline page URL from a raw page, without parsing it.
+    It is the same URL _parse_timeline_page() returns, but much cheaper.
+
+    Args:
+        text (str): page HTML
+        start (str): %Y-%m formatted month to stop at, if any
+
+    Returns:
+        Optional[str]: the URL of the next page, or None if it is the last
+            page or the next page is entirely before the `start` month.
+    """
+    form = _FORM_PATTERN.search(text)
+    if not form:
+        return None
+    url = _DATA_URL_PATTERN.search(form.group())
+    # no "Show more activity" button on the last page
+    form_end = text.find('</form>', form.end())
+    if form_end < 0:
+        form_end = len(text)
+    if not url or text.find('<button', form.end(), form_end) < 0:
+        return None
+    url = unescape(url.group(1))
+    to_month = _TO_MONTH_PATTERN.search(url)
+    if start and to_month and to_month.group(1) < start:
+        return None
+    return url
+
+
+def _parse_timeline_page_worker(text, start, parser):
+    # type: (str, str, str) -> tuple
+    """ _parse_timeline_page() for process pools,
+    where HTML_PARSER of the parent process might be not set """
+    global HTML_PARSER
+    HTML_PARSER = parser
+    return _parse_timeline_page(text, start)
+
+
+def _contributor_stats_columns(stats):
+    # type: (list) -> dict
+    """ Convert contributor stats JSON into columnar NumPy arrays
+
+    Returns:
+        Dict[str, numpy.ndarray]: see Scraper.project_contributor_stats()
+    """
+    import numpy as np
+    weeks = sorted({week['w'] for contributor in stats
+                    for week in contributor['weeks']})
+    week_index = {week: i for i, week in enumerate(weeks)}
+    shape = (len(weeks), len(stats))
+    columns = {
+        'weeks': np.array(weeks, dtype=np.int64),
+        'logins': np.empty(len(stats), dtype=object),
+        'ids': np.empty(len(stats), dtype=np.int64),
+        'totals': np.empty(len(stats), dtype=np.int64),
+        'additions': np.zeros(shape, dtype=np.int32),
+        'deletions': np.zeros(shape, dtype=np.int32),
+        'commits': np.zeros(shape, dtype=np.int32),
+    }
+    for i, contributor in enumerate(stats):
+        # deleted accounts might have no author
+        author = contributor.get('author') or {}
+        columns['logins'][i] = author.get('login')
+        columns['ids'][i] = author.get('id', -1)
+        columns['totals'][i] = contributor.get('total', 0)
+        rows = [week_index[week['w']] for week in contributor['weeks']]
+        for column, key in (('additions', 'a'), ('deletions', 'd'),
+                            ('commits', 'c')):
+            columns[column][rows, i] = [
+                week[key] for week in contributor['weeks']]
+    return columns
+
+
+def _compact_int_dtype(values):
+    """ Get the smallest signed NumPy integer dtype holding all values """
+    import numpy as np
+    top = max(values.max(), -values.min() - 1) if len(values) else 0
+    for dtype in (np.int8, np.int16, np.int32):
+        if top <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _timeline_frame(rows, columns=COLUMNS):
+    # type: (Iterable[Union[dict, ActivityRow]], Tuple[str]) -> pd.DataFrame
+    """ Build a DataFrame from timeline rows, see
+    Scraper.full_user_activity_timeline_frame()
+
+    Rows are consumed one by one into typed column buffers, so no
+    intermediate list of rows or object columns is created.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # categories and their codes in the order of appearance
+    categories = {'month': {}, 'repo': {}}
+    codes = {'month': array.array('i'), 'repo': array.array('i')}
+    counters = {column: array.array('i') for column in columns}
+
+    for activity in rows:
+        for field in ('month', 'repo'):
+            value = activity.get(field)
+            if value is None:  # private contributions
+                code = -1
+            else:
+                code = categories[field].setdefault(
+                    value, len(categories[field]))
+            codes[field].append(code)
+        for column in columns:
+            counters[column].append(activity.get(column, 0))
+
+    def category(field):
+        values = sorted(categories[field], key=categories[field].get)
+        return pd.Categorical.from_codes(
+            np.frombuffer(codes[field], dtype=np.intc), values)
+
+    index = pd.MultiIndex.from_arrays(
+        [category('month'), category('repo')], names=['month', 'repo'])
+    data = OrderedDict()
+    for column in columns:
+        values = np.frombuffer(counters[column], dtype=np.intc)
+        data[column] = values.astype(_compact_int_dtype(values))
+    return pd.DataFrame(data, index=index)
+
+
+def _date_range(start, end=None):
+    # type: (str, str) -> tuple
+    """ Parse start and end dates, end defaulting to today
+
+    Returns:
+        Tuple[datetime.date, datetime.date]: (start, end)
+    """
+    dates = []
+    for date in (start, end or datetime.date.today()):
+        date = parse_date(date)
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        dates.append(date)
+    return tuple(dates)
+
+
+def _timeline_checkpoint_args(start=None, to=None):
+    # type: (str, str) -> list
+    """ Serialize timeline arguments to validate TimelineCheckpoint """
+    return [date and str(date) for date in (start, to)]
+
+
+def _timeline_url(user, start=None, to=None):
+    # type: (str, str, str) -> tuple
+    """ Get the first page URL and the lower month bound for the user timeline
+
+    Returns:
+        Tuple[str, Optional[str]]: (url, %Y-%m formatted `start`)
+    """
+    if start:
+        start = parse_date(start).strftime('%Y-%m')
+    if to:
+        now = parse_date(to).strftime('%Y-%m-%d')
+    else:
+        now = datetime.datetime.now().strftime('%Y-%m-%d')
+
+    url = '/%s?tab=overview&include_header=no&utf8=✓&from=%s&to=%s' % (
+        user, now[:8] + '01', now)
+    return url, start
+
+
+def backoff_delay(attempt, base, cap):
+    # type: (int, float, float) -> float
+    """ Exponential backoff with jitter
+
+    Args:
+        attempt (int): number of the retry, starting from 0
+        base (float): delay before the first retry, seconds
+        cap (float): max delay, seconds
+
+    Returns:
+        float: a random delay between half and full exponential backoff,
+            so that concurrent clients do not retry all at once
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2.0 + random.uniform(0, delay / 2.0)
+
+
+def _retry_after(headers):
+    # type: (dict) -> Optional[float]
+    """ Get number of seconds to wait from the Retry-After header, if any """
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:  # HTTP-date
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+def _rate_limit_reset(headers):
+    # type: (dict) -> Optional[float]
+    """ Get the time (Unix timestamp) the rate limit budget is restored
+    if the server reports it is exhausted, i.e. Remaining is 0.
+    Supports GitHub API (X-RateLimit-*, reset as a timestamp) and IETF
+    draft (RateLimit-*, reset in seconds) headers. """
+    for prefix, relative in (('X-RateLimit-', False), ('RateLimit-', True)):
+        remaining = headers.get(prefix + 'Remaining')
+        reset = headers.get(prefix + 'Reset')
+        if remaining is None or reset is None:
+            continue
         try:
-            return func(*args, **kwargs)
+            if int(remaining) > 0:
+                return None
+            reset = float(reset)
+        except ValueError:
+            continue
+        return time.time() + reset if relative else reset
+    return None
+
+
+class RateLimiter(object):
+    """ Keep track of issued requests to stay under the rate limit:
+    at most `max_size` requests in `time_length` seconds.
+
+    The limit is adjusted to the server using AIMD (additive increase,
+    multiplicative decrease): after every `max_size` successful responses
+    it grows by one, up to `max_limit`; a rate limited response (HTTP 429)
+    halves it and blocks new requests for the time requested by the
+    server (Retry-After), or an exponential backoff with jitter.
+    Responses reporting exhausted budget (e.g. X-RateLimit-Remaining: 0)
+    block new requests until the budget is restored.
+
+    This class is thread safe and it does not sleep by itself,
+    so the same instance can be shared by blocking and asyncio clients.
+
+    Args:
+        max_size (int): initial number of requests..
+        time_length (int): ..per this many seconds
+        max_limit (int): max number of requests per `time_length` to probe.
+            Default: `max_size`, i.e. the limit is never increased.
+    """
+    decrease_factor = 0.5
+    # backoff after consecutive HTTP 429 responses without Retry-After
+    backoff_base = 10
+    backoff_cap = 600
+
+    def __init__(self, max_size, time_length, max_limit=None):
+        self.max_size = max_size
+        self.max_limit = max(max_size, max_limit or max_size)
+        self.time_length = time_length
+        self.timestamps = deque()
+        self.blocked_until = 0
+        self.successes = 0  # successful responses since the last increase
+        self.penalties = 0  # consecutive rate limited responses
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # type: () -> float
+        """ Reserve a slot for one request
+
+        Returns:
+            float: number of seconds to wait before issuing the request
+        """
+        with self.lock:
+            now = time.time()
+            request_time = max(now, self.blocked_until)
+            # the limit might have been decreased, so pop maybe more than one
+            while len(self.timestamps) >= self.max_size:
+                request_time = max(
+                    request_time, self.timestamps.popleft() + self.time_length)
+            self.timestamps.append(request_time)
+        return request_time - now
+
+    def next_slot(self):
+        # type: () -> float
+        """ Get the earliest time (Unix timestamp) a request can be issued
+        without exceeding the limit. Unlike .reserve(), it does not
+        reserve anything. """
+        with self.lock:
+            if len(self.timestamps) < self.max_size:
+                return self.blocked_until
+            return max(self.blocked_until, self.timestamps[
+                len(self.timestamps) - self.max_size] + self.time_length)
+
+    def on_response(self, headers):
+        # type: (dict) -> None
+        """ Adjust the limit after a response which was not rate limited """
+        reset = _rate_limit_reset(headers)
+        with self.lock:
+            self.penalties = 0
+            if reset is not None:
+                self.blocked_until = max(self.blocked_until, reset)
+            self.successes += 1
+            if self.successes >= self.max_size:
+                self.successes = 0
+                self.max_size = min(self.max_size + 1, self.max_limit)
+
+    def on_rate_limited(self, headers):
+        # type: (dict) -> float
+        """ Adjust the limit after a rate limited response (HTTP 429)
+
+        Returns:
+            float: number of seconds new requests are blocked for
+        """
+        delay = _retry_after(headers)
+        with self.lock:
+            now = time.time()
+            if now < self.blocked_until:
+                # concurrent requests issued before the block, already handled
+                return self.blocked_until - now
+            if delay is None:
+                delay = backoff_delay(
+                    self.penalties, self.backoff_base, self.backoff_cap)
+            self.penalties += 1
+            self.successes = 0
+            self.max_size = max(1, int(self.max_size * self.decrease_factor))
+            self.blocked_until = now + delay
+        return delay
+
+
+class Identity(object):
+    """ A session (cookies, headers, proxies) with its own rate limit budget
+
+    Args:
+        session (requests.Session): a session to use for requests.
+            A new one is created by default.
+        queue_max_size (int): max number of requests..
+        queue_time_length (int): ..in this many seconds
+        queue_max_limit (int): upper bound of the adaptive limit,
+            see RateLimiter
+    """
+    def __init__(self, queue_max_size, queue_time_length, session=None,
+                 queue_max_limit=None):
+        self.session = session or requests.Session()
+        self.limiter = RateLimiter(
+            queue_max_size, queue_time_length, queue_max_limit)
+
+
+class _Histogram(object):
+    """ Prometheus-style histogram: counts of observations by bucket """
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # type: () -> list
+        """ Get (upper bound, cumulative count) pairs, as in Prometheus """
+        total = 0
+        res = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            res.append((bound, total))
+        return res
+
+
+class Metrics(object):
+    """ Network metrics of Scraper requests
+
+    Collects counters and histograms of HTTP requests: latency, response
+    size, status codes, retries, rate limit hits and time spent waiting for
+    the rate limit. Requests served from the cache are not counted.
+
+    Every observation is also passed to hooks, called synchronously as
+    `hook(event, data)` in the thread issuing the request. Events are:
+
+    - 'response': every HTTP response, including errors.
+        data: url, status, seconds (latency), bytes (body size)
+    - 'retry': a request is retried after a connection error or HTTP 5xx.
+        data: url, reason ('connection_error' or 'server_error')
+    - 'rate_limited': HTTP 429 response. data: url
+    - 'hibernate': waiting for the rate limit budget. data: seconds
+
+    >>> metrics = Scraper().metrics
+    >>> metrics.add_hook(
+    ...     lambda event, data: print(event, data))  # doctest: +SKIP
+    >>> with open('metrics.prom', 'w') as fh:  # doctest: +SKIP
+    ...     fh.write(metrics.prometheus())
+    """
+    latency_buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    size_buckets = (1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hooks = []
+        self.responses = defaultdict(int)  # status code: count
+        self.retries = defaultdict(int)  # reason: count
+        self.rate_limited = 0
+        self.hibernate_seconds = 0.0
+        self.latency = _Histogram(self.latency_buckets)
+        self.size = _Histogram(self.size_buckets)
+
+    def add_hook(self, hook):
+        # type: (callable) -> None
+        """ Register a callback to be called on every event """
+        self.hooks.append(hook)
+
+    def emit(self, event, **data):
+        # type: (str, **object) -> None
+        """ Record an event, see the class docstring for events """
+        with self.lock:
+            if event == 'response':
+                self.responses[data['status']] += 1
+                self.latency.observe(data['seconds'])
+                self.size.observe(data['bytes'])
+            elif event == 'retry':
+                self.retries[data['reason']] += 1
+            elif event == 'rate_limited':
+                self.rate_limited += 1
+            elif event == 'hibernate':
+                self.hibernate_seconds += data['seconds']
+            else:
+                raise ValueError("Unknown event: " + event)
+        for hook in self.hooks:
+            hook(event, data)
+
+    def prometheus(self, prefix='stgithub'):
+        # type: (str) -> str
+        """ Get metrics in Prometheus text exposition format """
+        lines = []
+
+        def header(name, kind, description):
+            lines.append("# HELP %s_%s %s" % (prefix, name, description))
+            lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+
+        def histogram(name, hist):
+            for bound, count in hist.cumulative():
+                lines.append('%s_%s_bucket{le="%s"} %d'
+                             % (prefix, name, bound, count))
+            lines.append("%s_%s_sum %s" % (prefix, name, hist.sum))
+            lines.append("%s_%s_count %d" % (prefix, name, hist.count))
+
+        with self.lock:
+            header('responses_total', 'counter', "HTTP responses by status")
+            for status, count in sorted(self.responses.items()):
+                lines.append('%s_responses_total{status="%s"} %d'
+                             % (prefix, status, count))
+            header('retries_total', 'counter',
+                   "Retried requests by reason")
+            for reason, count in sorted(self.retries.items()):
+                lines.append('%s_retries_total{reason="%s"} %d'
+                             % (prefix, reason, count))
+            header('rate_limited_total', 'counter', "HTTP 429 responses")
+            lines.append("%s_rate_limited_total %d"
+                         % (prefix, self.rate_limited))
+            header('hibernate_seconds_total', 'counter',
+                   "Time spent waiting for the rate limit")
+            lines.append("%s_hibernate_seconds_total %s"
+                         % (prefix, self.hibernate_seconds))
+            header('request_duration_seconds', 'histogram',
+                   "HTTP request latency")
+            histogram('request_duration_seconds', self.latency)
+            header('response_size_bytes', 'histogram',
+                   "HTTP response body size")
+            histogram('response_size_bytes', self.size)
+        return "\n".join(lines) + "\n"
+
+
+class CacheEntry(object):
+    """ A response stored in ResponseCache """
+    def __init__(self, url, content, encoding, headers, fresh):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers
+        self.fresh = fresh
+
+    def validators(self):
+        # type: () -> dict
+        """ Get conditional request headers to revalidate this entry """
+        headers = {}
+        if self.headers.get('ETag'):
+            headers['If-None-Match'] = self.headers['ETag']
+        if self.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+    def response(self):
+        # type: () -> requests.Response
+        """ Reconstruct the cached response """
+        r = requests.Response()
+        r.status_code = 200
+        r.url = self.url
+        r._content = self.content
+        r._content_consumed = True  # i.e. iter_content() uses ._content
+        r.encoding = self.encoding
+        r.headers = requests.structures.CaseInsensitiveDict(self.headers)
+        return r
+
+
+class ResponseCache(object):
+    """ Persistent sqlite-backed cache of successful responses
+
+    Fresh responses are served without sending any requests, i.e. they
+    do not use any rate limit budget. Stale responses are revalidated
+    using ETag/Last-Modified headers, if the server provided any.
+
+    Args:
+        path (str): sqlite database path. ':memory:' is acceptable,
+            but makes the cache not persistent.
+        ttl (Iterable[Tuple[str, int]]): time to live of cached responses,
+            in seconds, as (URL regex, ttl) pairs. The first matching pattern
+            is used, URLs not matching any pattern are always revalidated.
+            Default: CACHE_TTL
+
+    >>> Scraper().cache = ResponseCache('github_cache.sqlite')  # doctest: +SKIP
+    """
+    saved_headers = ('Content-Type', 'ETag', 'Last-Modified')
+
+    def __init__(self, path, ttl=CACHE_TTL):
+        self.ttl = [(re.compile(pattern), seconds) for pattern, seconds in ttl]
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "  key TEXT PRIMARY KEY, url TEXT, content BLOB, encoding TEXT, "
+            "  headers TEXT, stored REAL)")
+        self.db.commit()
+
+    @staticmethod
+    def key(url, params=None, headers=None):
+        # type: (str, dict, dict) -> str
+        """ Get cache key for a request """
+        url = requests.Request('GET', url, params=params).prepare().url
+        return url + ' ' + (headers or {}).get('Accept', '')
+
+    def get_ttl(self, url):
+        # type: (str) -> int
+        for pattern, seconds in self.ttl:
+            if pattern.search(url):
+                return seconds
+        return 0
+
+    def lookup(self, url, params=None, headers=None):
+        # type: (str, dict, dict) -> CacheEntry
+        """ Get cached response for a request
+
+        Returns:
+            Optional[CacheEntry]: cached response, or None if there is none
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT url, content, encoding, headers, stored "
+                "FROM responses WHERE key = ?",
+                (self.key(url, params, headers),)).fetchone()
+        if row is None:
+            return None
+        url, content, encoding, saved_headers, stored = row
+        fresh = time.time() < stored + self.get_ttl(url)
+        return CacheEntry(url, bytes(content), encoding,
+                          json.loads(saved_headers), fresh)
+
+    def store(self, url, params, headers, response):
+        # type: (str, dict, dict, requests.Response) -> None
+        """ Save a successful response; empty responses are not cached """
+        if response.status_code != 200 or not response.content:
+            return
+        saved_headers = {h: response.headers[h]
+                         for h in self.saved_headers if h in response.headers}
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(url, params, headers), response.url,
+                 sqlite3.Binary(response.content), response.encoding,
+                 json.dumps(saved_headers), time.time()))
+            self.db.commit()
+
+    def refresh(self, url, params=None, headers=None):
+        # type: (str, dict, dict) -> None
+        """ Mark cached response as fresh, e.g. after a 304 response """
+        with self.lock:
+            self.db.execute(
+                "UPDATE responses SET stored = ? WHERE key = ?",
+                (time.time(), self.key(url, params, headers)))
+            self.db.commit()
+
+
+class TimelineCheckpoint(object):
+    """ Persistent progress of Scraper.full_user_activity_timeline()
+
+    After every timeline page, the next page URL and the rows emitted so
+    far are saved, so that an interrupted scraping job can be restarted
+    without requesting the same pages again. Emitted rows are replayed
+    on restart, so the consumer still gets the full timeline.
+    Checkpoints are removed once the timeline is completed.
+
+    Checkpoints are append-only JSON lines files, one per user;
+    an incomplete last line, e.g. after a crash, is ignored.
+
+    Args:
+        path (str): directory to store checkpoints in
+
+    >>> checkpoint = TimelineCheckpoint('checkpoints')  # doctest: +SKIP
+    >>> for activity in Scraper().full_user_activity_timeline(
+    ...         'user2589', checkpoint=checkpoint):  # doctest: +SKIP
+    ...     pass
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _fname(self, user):
+        return os.path.join(self.path, user + '.jsonl')
+
+    def load(self, user, args):
+        # type: (str, list) -> tuple
+        """ Get saved progress for a user timeline
+
+        Args:
+            user (str): GitHub login
+            args (list): timeline arguments; the checkpoint is ignored
+                if it was saved with different arguments.
+
+        Returns:
+            Tuple[Optional[str], List[dict]]: next page URL and emitted
+                rows, or (None, []) if there is no valid checkpoint.
+        """
+        url = None
+        rows = []
+        try:
+            fh = open(self._fname(user))
+        except IOError:
+            return None, rows
+        with fh:
+            for i, line in enumerate(fh):
+                try:
+                    record = json.loads(line)
+                except ValueError:  # incomplete record
+                    break
+                if i == 0:
+                    if record.get('args') != args:
+                        return None, []
+                    continue
+                url = record['url']
+                rows.extend(record['rows'])
+        return url, rows
+
+    def save(self, user, args, url, rows):
+        # type: (str, list, str, list) -> None
+        """ Save progress after a timeline page
+
+        Args:
+            user (str): GitHub login
+            args (list): timeline arguments, see .load()
+            url (str): next page URL
+            rows (list): rows emitted from the last page
+        """
+        fname = self._fname(user)
+        new = not os.path.isfile(fname)
+        with open(fname, 'a') as fh:
+            if new:
+                fh.write(json.dumps({'args': args}) + '\n')
+            fh.write(json.dumps({'url': url, 'rows': rows}) + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def clear(self, user):
+        # type: (str) -> None
+        """ Remove checkpoint, e.g. after the timeline is completed """
+        try:
+            os.remove(self._fname(user))
+        except OSError:
+            pass
+
+
+def _intern(value):
+    """ Intern a string, so that equal strings share memory.
+    Only `str` can be interned, i.e. not `unicode` in Python 2 """
+    if isinstance(value, str):
+        # str() converts subclasses, e.g. lxml string results, to str
+        return six.moves.intern(str(value))
+    return value
+
+
+class ContributorStatsHarvester(object):
+    """ Fetch contributor stats of many repositories into sharded storage
+
+    Repositories are fetched concurrently in a thread pool, under
+    the scraper rate limit. Every result is written to its own
+    gzipped JSON file as soon as it is received, in one of 256 shard
+    directories (by slug hash), so directories stay small for hundreds
+    of thousands of repositories.
+
+    Repositories already stored or known to be missing (HTTP 404) are
+    skipped, so an interrupted harvest can be restarted with the same
+    list. 404s and failures are recorded in `status.jsonl`;
+    failed repositories are retried on the next run.
+
+    GitHub computes stats of rarely visited repositories on demand, which
+    can take a minute or so; until then it returns empty responses.
+    Such repositories are not waited for: they are put aside and polled
+    again with exponential backoff (`poll_backoff_base`, `poll_backoff_cap`
+    seconds), while other repositories are fetched in the meantime.
+    A repository is recorded as failed after `max_polls` empty responses.
+
+    Args:
+        path (str): storage directory
+        scraper (Scraper): scraper to use, default: the shared one
+        jobs (int): number of concurrent requests
+
+    >>> harvester = ContributorStatsHarvester('stats')  # doctest: +SKIP
+    >>> for repo_slug, status in harvester.harvest(
+    ...         open('slugs.txt').read().split()):  # doctest: +SKIP
+    ...     print(repo_slug, status)
+    >>> harvester.load('pandas-dev/pandas')  # doctest: +SKIP
+    """
+    # with the defaults, a repository is given up on after 5-10 minutes
+    poll_backoff_base = 5
+    poll_backoff_cap = 120
+    max_polls = 10
+
+    def __init__(self, path, scraper=None, jobs=8):
+        self.path = path
+        self.scraper = scraper or Scraper()
+        self.jobs = jobs
+        self.lock = threading.Lock()
+        self.status_fname = os.path.join(path, 'status.jsonl')
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _fname(self, repo_slug):
+        shard = hashlib.md5(repo_slug.encode('utf8')).hexdigest()[:2]
+        return os.path.join(
+            self.path, shard, repo_slug.replace('/', '__') + '.json.gz')
+
+    def stored(self, repo_slug):
+        # type: (str) -> bool
+        return os.path.isfile(self._fname(repo_slug))
+
+    def load(self, repo_slug):
+        # type: (str) -> list
+        """ Get stored stats, see Scraper.project_contributor_stats() """
+        with gzip.open(self._fname(repo_slug), 'rb') as fh:
+            return json.loads(fh.read().decode('utf8'))
+
+    def statuses(self):
+        # type: () -> dict
+        """ Get recorded 404s and failures, {repo_slug: (status, error)}.
+        Only the last status of every repository is returned. """
+        statuses = {}
+        try:
+            fh = open(self.status_fname)
+        except IOError:
+            return statuses
+        with fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # incomplete record
+                    continue
+                statuses[record['slug']] = (record['status'], record['error'])
+        return statuses
+
+    def _record(self, repo_slug, status, error=None):
+        with self.lock:
+            with open(self.status_fname, 'a') as fh:
+                fh.write(json.dumps({'slug': repo_slug, 'status': status,
+                                     'error': error}) + '\n')
+
+    def _store(self, repo_slug, stats):
+        fname = self._fname(repo_slug)
+        dirname = os.path.dirname(fname)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:  # created by another thread
+                pass
+        # write to a temporary file first, so that interrupted writes
+        # are not mistaken for stored stats
+        tmp_fname = fname + '.%d.tmp' % threading.current_thread().ident
+        with gzip.open(tmp_fname, 'wb') as fh:
+            fh.write(json.dumps(stats).encode('utf8'))
+        os.rename(tmp_fname, fname)
+
+    def _fetch(self, repo_slug):
+        try:
+            stats = self.scraper._contributor_stats_once(repo_slug)
+            if stats is None:
+                return repo_slug, 'not_ready'
+            self._store(repo_slug, stats)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                self._record(repo_slug, 'not_found')
+                return repo_slug, 'not_found'
+            self._record(repo_slug, 'failed', str(e))
+            return repo_slug, 'failed'
+        except Exception as e:
+            logging.exception("Failed to get contributor stats of %s",
+                              repo_slug)
+            self._record(repo_slug, 'failed', repr(e))
+            return repo_slug, 'failed'
+        return repo_slug, 'stored'
+
+    def _pool_fetch(self, repo_slug):
+        # a task raising in the pool is never reported to harvest(), so
+        # errors, e.g. failing to record a status, are passed over instead
+        try:
+            return self._fetch(repo_slug) + (None,)
+        except Exception:
+            return repo_slug, None, sys.exc_info()
+
+    def harvest(self, repo_slugs):
+        # type: (Iterable[str]) -> Generator[Tuple[str, str]]
+        """ Fetch and store stats of repositories not harvested yet
+
+        Args:
+            repo_slugs (Iterable[str]): <owner_login>/<repo_name> slugs.
+                It is consumed lazily, so it can be e.g. an open file.
+
+        Yields:
+            Tuple[str, str]: (repo_slug, status) for every fetched repository,
+                in the order of completion. Status is one of 'stored',
+                'not_found' and 'failed'. Skipped repositories are not
+                reported; repositories with stats not ready yet are
+                reported once they are stored or given up on.
+        """
+        not_found = {slug for slug, (status, _) in self.statuses().items()
+                     if status == 'not_found'}
+        todo = (slug for slug in (slug.strip() for slug in repo_slugs)
+                if slug and slug not in not_found and not self.stored(slug))
+
+        # (time to poll, sequence number, slug); the sequence number keeps
+        # the order of repositories due at the same time
+        deferred = []  # type: List[Tuple[float, int, str]]
+        sequence = itertools.count()
+        polls = defaultdict(int)  # type: Dict[str, int]
+        results = six.moves.queue.Queue()
+        pool = ThreadPool(self.jobs)
+        in_flight = 0
+        exhausted = False
+        try:
+            while True:
+                # fill the pool, repositories due to be polled go first
+                while in_flight < self.jobs:
+                    if deferred and deferred[0][0] <= time.time():
+                        repo_slug = heapq.heappop(deferred)[2]
+                    elif not exhausted:
+                        repo_slug = next(todo, None)
+                        if repo_slug is None:
+                            exhausted = True
+                            continue
+                    else:
+                        break
+                    pool.apply_async(self._pool_fetch, (repo_slug,),
+                                     callback=results.put)
+                    in_flight += 1
+
+                if not in_flight:
+                    if not deferred:
+                        return
+                    time.sleep(max(0, deferred[0][0] - time.time()))
+                    continue
+
+                # wake up when a deferred repository is due, even if
+                # no request has completed by then
+                timeout = None
+                if deferred:
+                    timeout = max(0, deferred[0][0] - time.time())
+                try:
+                    repo_slug, status, exc_info = results.get(timeout=timeout)
+                except six.moves.queue.Empty:
+                    continue
+                in_flight -= 1
+                if exc_info is not None:
+                    six.reraise(*exc_info)
+
+                if status == 'not_ready':
+                    attempt = polls[repo_slug]
+                    if attempt + 1 < self.max_polls:
+                        polls[repo_slug] += 1
+                        delay = backoff_delay(attempt, self.poll_backoff_base,
+                                              self.poll_backoff_cap)
+                        logging.info("Contributor stats of %s are not ready, "
+                                     "polling again in %.2f seconds..",
+                                     repo_slug, delay)
+                        heapq.heappush(deferred, (time.time() + delay,
+                                                  next(sequence), repo_slug))
+                        continue
+                    status = 'failed'
+                    self._record(repo_slug, status,
+                                 "GitHub returns empty responses after %d "
+                                 "attempts" % self.max_polls)
+                polls.pop(repo_slug, None)
+                yield repo_slug, status
         finally:
-            semaphore.release()
+            pool.terminate()
+
+
+class ActivityRow(namedtuple('ActivityRow', ('month', 'repo') + COLUMNS)):
+    """ Compact representation of a timeline activity row
+
+    A named tuple with `month`, `repo` and all activity counters (COLUMNS),
+    zero by default. Month and repository strings are interned, so rows
+    of the same repository or month share them. A row takes about half
+    the memory of an activity dictionary, not counting the strings,
+    which makes a difference when millions of rows are held in memory.
+
+    Named tuples are understood by the pd.DataFrame constructor:
+
+    >>> pd.DataFrame(Scraper().full_user_activity_timeline(
+    ...     'user2589', compact=True))  # doctest: +SKIP
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, activity):
+        # type: (dict) -> ActivityRow
+        """ Convert an activity dictionary to a compact row """
+        return cls(_intern(activity['month']), _intern(activity['repo']),
+                   *(activity.get(column, 0) for column in COLUMNS))
+
+    def get(self, key, default=None):
+        """ dict-like access to fields, e.g. row.get('commits') """
+        return getattr(self, key, default)
+
+
+class TimelineWriter(object):
+    """ Streaming writer of activity timeline rows
+
+    Every row is written and flushed immediately, in a fixed column order:
+    `key_columns`, then activity counters. Missing counters are written as
+    zeros. So, memory use does not depend on the timeline length, and
+    the output can be consumed while it is being written, e.g. by `tail -f`.
+
+    Args:
+        fh (file): text file to write to
+        fmt (str): 'csv' (with a header), or 'jsonl' (JSON lines)
+        key_columns (Tuple[str]): row fields identifying the row,
+            written as is
+        columns (Tuple[str]): activity counters. Default: COLUMNS
+
+    >>> writer = TimelineWriter(sys.stdout)  # doctest: +SKIP
+    >>> for activity in Scraper().full_user_activity_timeline(
+    ...         'user2589'):  # doctest: +SKIP
+    ...     writer.write(activity)
+    """
+    formats = ('csv', 'jsonl')
+
+    def __init__(self, fh, fmt='csv', key_columns=('month', 'repo'),
+                 columns=COLUMNS):
+        if fmt not in self.formats:
+            raise ValueError("Unknown output format: %s" % fmt)
+        self.fh = fh
+        self.fmt = fmt
+        self.key_columns = tuple(key_columns)
+        self.columns = tuple(columns)
+        if fmt == 'csv':
+            self.csv_writer = csv.writer(fh)
+            self.csv_writer.writerow(self.key_columns + self.columns)
+            fh.flush()
+
+    def write(self, activity):
+        # type: (Union[dict, ActivityRow]) -> None
+        """ Write a single row, e.g. from full_user_activity_timeline() """
+        if isinstance(activity, dict):
+            values = [activity[c] for c in self.key_columns]
+        else:  # ActivityRow
+            values = [getattr(activity, c) for c in self.key_columns]
+        values.extend(activity.get(c, 0) for c in self.columns)
+        if self.fmt == 'csv':
+            self.csv_writer.writerow(values)
+        else:
+            self.fh.write(json.dumps(OrderedDict(
+                zip(self.key_columns + self.columns, values))) + '\n')
+        self.fh.flush()
 
-    return wrapper
+
+def _put_until(queue, item, stopped):
+    # type: (six.moves.queue.Queue, object, threading.Event) -> bool
+    """ Put an item to a bounded queue, unless the consumer is stopped
+
+    Returns:
+        bool: False if the item was not put because of the stop flag
+    """
+    while not stopped.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+        except six.moves.queue.Full:
+            continue
+        return True
+    return False
 
 
 class Scraper(object):
@@ -339,79 +1911,243 @@ class Scraper(object):
         typically takes couple minutes.
         Use this "API" with caution as it might be extremely slow.
 
+    `Scraper()` returns the same shared instance every time, so rate limit
+    accounting, identities and the cache are shared by all its users.
+    `Scraper(shared=False)` creates an independent instance with its own
+    identities, e.g. to split work between different sets of sessions.
+
+    Instances are thread safe. Only the rate limit accounting is
+    synchronized, so HTTP requests from different threads run in parallel,
+    see :py:meth:`map`.
 
+    Args:
+        shared (bool): return the shared instance, default: True
     """
     _instance = None  # singleton instance
+    # relative URLs are requested from this server, e.g. a local stand-in
+    base_url = BASE_URL
     cookies = None  # cookies for non-API URLs
+    cache = None  # optional ResponseCache
+    metrics = None  # network Metrics, see .metrics
     # limit is imposed if over 40 requests are made in 80 seconds
-    # thus, keeping track of issued requests
-    queue = None
-    # after many experiments, 40/121 looks to be the fastest option
+    # thus, keeping track of issued requests, separately for every identity
+    identities = None
+    # after many experiments, 40/121 looks to be the fastest option.
+    # These are defaults for new identities. The limit backs off when GitHub
+    # starts rejecting requests; set queue_max_limit above queue_max_size
+    # to also probe for a higher limit. None: never exceed queue_max_size
     queue_max_size = 40
     queue_time_length = 121
+    queue_max_limit = None
     retries_on_timeout = 5
-
-    def __new__(cls, *args, **kwargs):  # Singleton
+    # max number of recent links remembered to skip duplicates in the feed
+    feed_dedup_size = 10000
+    # stop paging the feed after this many pages, in case GitHub never
+    # returns an empty one
+    feed_max_pages = 100
+    # exponential backoff on network errors and GitHub downtimes, seconds
+    retry_backoff_base = 1
+    retry_backoff_cap = 30
+    # GitHub computes contributor stats of rarely visited repositories
+    # on demand, which can take a minute. Until then, it returns empty
+    # responses, which are polled again with exponential backoff, seconds
+    stats_backoff_base = 1
+    stats_backoff_cap = 15
+    stats_wait_timeout = 60
+
+    def __new__(cls, shared=True):  # Singleton, unless shared=False
+        if not shared:
+            return super(Scraper, cls).__new__(cls)
         if not isinstance(cls._instance, cls):
-            cls._instance = super(Scraper, cls).__new__(cls, *args, **kwargs)
+            cls._instance = super(Scraper, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.queue = six.moves.queue.Queue(maxsize=self.queue_max_size)
+    def __init__(self, shared=True):
+        if self.identities is not None:  # singleton is already initialized
+            return
+        self.identities = []
+        self.identities_lock = threading.Lock()
+        self.metrics = Metrics()
+        default_identity = self.add_identity()
+        self.session = default_identity.session
+        self.limiter = default_identity.limiter
+
+    def add_identity(self, session=None, queue_max_size=None,
+                     queue_time_length=None, queue_max_limit=None):
+        # type: (requests.Session, int, int, int) -> Identity
+        """ Register one more session with its own rate limit budget.
+
+        Requests are issued using the identity which will have budget
+        available the soonest, so throughput grows roughly linearly
+        with the number of identities.
 
-    @guard
-    def _request(self, url, params=None, headers=None):
-        headers = headers or HEADERS
+        Args:
+            session (requests.Session): a session to use, e.g. logged in
+                as a different user or using a different proxy.
+                A new session is created by default.
+            queue_max_size (int): rate limit for this identity, max number
+                of requests in `queue_time_length` seconds.
+                Default: Scraper.queue_max_size
+            queue_time_length (int): rate limit window, in seconds.
+                Default: Scraper.queue_time_length
+            queue_max_limit (int): upper bound of the adaptive rate limit,
+                see RateLimiter. Default: Scraper.queue_max_limit
 
-        if not url.startswith(BASE_URL):
-            url = BASE_URL + url
+        Returns:
+            Identity: the registered identity
+        """
+        identity = Identity(queue_max_size or self.queue_max_size,
+                            queue_time_length or self.queue_time_length,
+                            session, queue_max_limit or self.queue_max_limit)
+        with self.identities_lock:
+            self.identities.append(identity)
+        return identity
 
-        while True:
-            if self.queue.full():
-                sleep_interval = self.queue.get() - time.time() + self.queue_time_length
-                if sleep_interval > 0:
-                    logging.info("Hibernating for %.2f seconds to maintain "
-                                 "GitHub XHR rate limit..", sleep_interval)
-                    time.sleep(sleep_interval)
-
-            self.queue.put(time.time())
-
-            # handle network errors and GitHub downtimes
-            # also, internal errors, like joshaber March 2015
-            r = None
-            for _ in range(self.retries_on_timeout):
-                try:
-                    r = self.session.get(url, headers=headers, params=params)
-                except requests.exceptions.RequestException:
-                    time.sleep(1)
-                    continue
+    def _reserve(self):
+        # type: () -> tuple
+        """ Reserve a request slot with the identity having budget left soonest
 
+        Returns:
+            Tuple[Identity, float]: the identity to use and the number of
+                seconds to wait before issuing the request
+        """
+        with self.identities_lock:
+            identity = min(
+                self.identities,
+                key=lambda i: (i.limiter.next_slot(), len(i.limiter.timestamps)))
+            return identity, identity.limiter.reserve()
+
+    def _get(self, url, params=None, headers=None, session=None,
+             stream=False):
+        """ Issue a single GET request, bypassing the rate limiter.
+        Network errors and GitHub downtimes are retried.
+
+        If `stream` is True, the response body is not downloaded yet;
+        the reported latency is time to headers and the size is taken
+        from Content-Length, if any.
+        """
+        session = session or self.session
+        kwargs = {'stream': True} if stream else {}
+        # handle network errors and GitHub downtimes
+        # also, internal errors, like joshaber March 2015
+        for attempt in range(self.retries_on_timeout):
+            retry = attempt < self.retries_on_timeout - 1
+            started = _timer()
+            try:
+                r = session.get(url, headers=headers, params=params, **kwargs)
+            except requests.exceptions.RequestException:
+                reason = 'connection_error'
+            else:
+                size = int(r.headers.get('Content-Length') or 0) if stream \
+                    else len(r.content)
+                self.metrics.emit(
+                    'response', url=url, status=r.status_code,
+                    seconds=_timer() - started, bytes=size)
                 if r.status_code < 500:
-                    break
-                else:
-                    r = None
+                    return r
+                r.close()
+                reason = 'server_error'
 
-            if r is None:
-                raise GitHubScrapingError(
-                    "GitHub is not responding to requests. Try again later.")
+            if retry:
+                self.metrics.emit('retry', url=url, reason=reason)
+                time.sleep(backoff_delay(attempt, self.retry_backoff_base,
+                                         self.retry_backoff_cap))
+
+        raise GitHubScrapingError(
+            "GitHub is not responding to requests. Try again later.")
+
+    def _request(self, url, params=None, headers=None, stream=False):
+        """ Issue a GET request, respecting the rate limit and the cache
+
+        Args:
+            stream (bool): do not download the response body upfront, so
+                that it can be consumed with `.iter_content()` and must be
+                closed afterwards. Ignored if there is a response cache.
+        """
+        headers = headers or HEADERS
+        # cached responses are stored as a whole
+        stream = stream and self.cache is None
+
+        if not url.startswith(self.base_url):
+            url = self.base_url + url
+
+        cached, request_headers = self._cache_lookup(url, params, headers)
+        if cached is not None and cached.fresh:
+            return cached.response()
+
+        while True:
+            identity, sleep_interval = self._reserve()
+            if sleep_interval > 0:
+                logging.info("Hibernating for %.2f seconds to maintain "
+                             "GitHub XHR rate limit..", sleep_interval)
+                self.metrics.emit('hibernate', seconds=sleep_interval)
+                time.sleep(sleep_interval)
+
+            r = self._get(url, params, request_headers, identity.session,
+                          stream)
 
             if r.status_code == 429:
-                logging.info("Hit GitHub XHR rate limit, retry in 10 seconds..")
-                time.sleep(10)
+                r.close()
+                # the wait is taken by ._reserve() on the next iteration;
+                # other identities might be available earlier
+                delay = identity.limiter.on_rate_limited(r.headers)
+                logging.info("Hit GitHub XHR rate limit, identity is blocked "
+                             "for %.2f seconds..", delay)
+                self.metrics.emit('rate_limited', url=url)
                 continue
 
+            identity.limiter.on_response(r.headers)
             break
 
+        return self._cache_update(url, params, headers, cached, r)
+
+    def _cache_lookup(self, url, params, headers):
+        """ Check the response cache before issuing a request
+
+        Returns:
+            Tuple[Optional[CacheEntry], dict]: cached response, if any,
+                and headers to send, including revalidation headers
+        """
+        cached = self.cache and self.cache.lookup(url, params, headers)
+        if cached is None:
+            return None, headers
+        request_headers = headers.copy()
+        request_headers.update(cached.validators())
+        return cached, request_headers
+
+    def _cache_update(self, url, params, headers, cached, r):
+        """ Update the response cache with a received response
+
+        Returns:
+            requests.Response: the response to return to the caller
+        """
+        if r.status_code == 304 and cached is not None:
+            self.cache.refresh(url, params, headers)
+            return cached.response()
+        if r.status_code >= 400:
+            # error pages are small; reading the body of a streamed response
+            # releases the connection back to the pool
+            r.content
+            r.close()
         r.raise_for_status()
+        if self.cache is not None:
+            self.cache.store(url, params, headers, r)
         return r
 
-    def project_contributor_stats(self, repo_slug):
-        # type: (str) -> list
+    def project_contributor_stats(self, repo_slug, columnar=False):
+        # type: (str, bool) -> Union[list, dict]
         """Get top 100 contributors weekly commit stats over the project history
 
+        If GitHub is still computing the stats, it is polled again with
+        exponential backoff for up to `stats_wait_timeout` seconds.
+        To fetch stats of many repositories without waiting for each of
+        them, use :py:class:`ContributorStatsHarvester`.
+
         Args:
             repo_slug (str): <owner_login>/<repo_name>
+            columnar (bool): return NumPy arrays instead of raw JSON, see below.
+                It takes much less memory for large projects and makes
+                aggregation faster. Requires NumPy.
 
         Returns:
             list: A list of top 100 contributors in the repo, with their logins,
@@ -419,6 +2155,15 @@ class Scraper(object):
                 of lines added, changed or deleted. Note that weeks are
                 started on Sunday and represented by a Unix timestamp.
 
+                If `columnar` is True, a dictionary of NumPy arrays:
+
+                - `weeks`: week timestamps, shape (weeks,)
+                - `logins`, `ids`, `totals`: contributor logins, user ids and
+                    total number of commits, shape (contributors,).
+                    Deleted accounts have login None and id -1.
+                - `additions`, `deletions`, `commits`: weekly counts,
+                    shape (weeks, contributors)
+
         >>> Scraper().project_contributor_stats('pandas-dev/pandas') # doctest: +SKIP
         [{u'author': {u'avatar': u'https://avatars0.githubusercontent.com/...',
            u'hovercard_url': u'/hovercards?user_id=1435085',
@@ -431,58 +2176,116 @@ class Scraper(object):
            {u'a': 0, u'c': 0, u'd': 0, u'w': 1250380800},
         ...
         }]
+        }]
+        >>> stats = Scraper().project_contributor_stats(
+        ...     'pandas-dev/pandas', columnar=True)  # doctest: +SKIP
+        >>> stats['additions'].shape  # doctest: +SKIP
+        (541, 100)
         """
-        for i in range(self.retries_on_timeout):
-            try:
-                res = self._request(
-                    "/%s/graphs/contributors-data" % repo_slug).json()
-            except ValueError:
-                # sometimes GitHub just returns empty page
-                # without throwing a timeout
-                time.sleep(1)
-                continue
-            else:
-                return res
-        raise GitHubScrapingError(
-            "GitHub returns empty responses. Try again later.")
+        delays = self._stats_poll_delays()
+        while True:
+            res = self._contributor_stats_once(repo_slug)
+            if res is not None:
+                return _contributor_stats_columns(res) if columnar else res
+            delay = next(delays, None)
+            if delay is None:
+                raise GitHubScrapingError(
+                    "GitHub returns empty responses. Try again later.")
+            time.sleep(delay)
+
+    def _stats_poll_delays(self):
+        # type: () -> Generator[float]
+        """ Delays between polls of contributor stats not computed yet,
+        seconds, adding up to no more than stats_wait_timeout """
+        waited = 0
+        for attempt in itertools.count():
+            delay = backoff_delay(attempt, self.stats_backoff_base,
+                                  self.stats_backoff_cap)
+            if waited + delay > self.stats_wait_timeout:
+                return
+            waited += delay
+            yield delay
+
+    def _contributor_stats_once(self, repo_slug):
+        # type: (str) -> Optional[list]
+        """ Single attempt to get contributor stats, without waiting.
+        Returns None if GitHub is still computing them: in this case it
+        returns an empty page (usually HTTP 202) without throwing a timeout.
+        """
+        r = self._request("/%s/graphs/contributors-data" % repo_slug)
+        try:
+            return r.json()
+        except ValueError:
+            return None
 
-    def user_daily_contrib_num(self, user, year):
-        # type: (str, int) -> dict
+    def user_daily_contrib_num(self, user, year, compact=False):
+        # type: (str, int, bool) -> Union[dict, tuple]
         """ Get number of daily contributions of a GitHub user in a given year.
         This method represents the white and green grid in the profile page.
 
         Args:
             user (str): The GitHub login of the user to get stats for.
             year (int): Year of contributions to get
+            compact (bool): return a start date and a NumPy array of daily
+                counts instead of a dictionary. Much more memory efficient
+                when loading many calendars. Requires NumPy.
 
         Returns:
-            dict: A dictionary with keys being %Y-%m-%d formatted dates, and
+            Union[dict, Tuple[datetime.date, numpy.ndarray]]:
+                A dictionary with keys being %Y-%m-%d formatted dates, and
                 values being the number of contributions. This method does not
                 differentiate types of contributions, i.e. it is a sum
                 of commits, issues, submitted and reviewed pull requests, etc.
+                If `compact` is True, a tuple of the first date and an int32
+                array of daily counts starting from this date.
 
         >>> Scraper().user_daily_contrib_num('user2589', 2018)
         {'2018-01-01': 0,
          '2018-01-02': 15,
          ...
          '2018-12-31': 0}
+        >>> Scraper().user_daily_contrib_num('user2589', 2018, compact=True)
+        (datetime.date(2018, 1, 1), array([ 0, 15, ...,  0], dtype=int32))
         """
         url = "/users/%s/contributions?from=%d-12-01&to=%d-12-31&full_graph=1" \
               % (user, year, year)
-        year = str(year)
-        start_token = '<svg'
-        stop_token = '/svg>'
-        response_text = self._request(url).text
-        # cut out first <svg> element,
-        # since HTML outside of it is sometimes malformed
-        response_text = start_token + response_text.split(
-            start_token, 1)[-1].split(stop_token, 1)[0] + stop_token
-        tree = ElementTree.fromstring(response_text)
-
-        return {rect.attrib['data-date']: _int(rect.attrib.get('data-count'))
-                for rect in tree.iter('rect')
-                if rect.attrib.get('class') == 'day'
-                and rect.attrib.get('data-date', '').startswith(year)}
+        return _parse_contrib_calendar(self._request(url).text, year, compact)
+
+    def user_daily_contrib_range(self, user, start, end=None, compact=False):
+        # type: (str, str, str, bool) -> Union[dict, tuple]
+        """ Get number of daily contributions of a GitHub user in a date range.
+
+        It is a more efficient alternative to calling
+        :py:meth:`user_daily_contrib_num` for every year: the range is
+        covered with the smallest number of calendar requests, each covering
+        53 weeks, which are merged into a single series.
+
+        Args:
+            user (str): The GitHub login of the user to get stats for.
+            start (str): first day of the range, e.g. '2012-06-01'.
+                `datetime.date` objects are also accepted.
+            end (str): last day of the range, inclusive. Default: today
+            compact (bool): same as in :py:meth:`user_daily_contrib_num`
+
+        Returns:
+            Union[dict, Tuple[datetime.date, numpy.ndarray]]: same as
+                :py:meth:`user_daily_contrib_num`, but for the whole range.
+
+        >>> Scraper().user_daily_contrib_range('user2589', '2012-01-01')
+        {'2012-01-01': 0,
+         ...
+         '2019-01-09': 2}
+        """
+        start, end = _date_range(start, end)
+        days = []
+        for from_date, to_date in _plan_contrib_requests(start, end):
+            text = self._request(
+                _contrib_range_url(user, from_date, to_date)).text
+            days.extend(_parse_contrib_range(text, from_date, to_date))
+        days.sort()
+        if compact:
+            return _compact_contrib_calendar(days)
+        return dict(days)
 
     def links_to_recent_user_activity(self, user):
         """ Get user events as a 2-tuple generator: (date, link).
@@ -515,24 +2318,108 @@ class Scraper(object):
             "This method is know to return incomplete data."
             "Proceed with caution.", DeprecationWarning)
 
+        # the same links often appear in several entries and pages
+        seen = _BoundedSet(self.feed_dedup_size)
         page = None
-        while True:
-            request = self._request('/%s' % user, params={'page': page},
-                                    headers={'Accept': 'application/atom+xml'})
+        for _ in range(self.feed_max_pages):
+            r = self._request('/%s' % user, params={'page': page},
+                              headers={'Accept': 'application/atom+xml'},
+                              stream=True)
             page = 1 if page is None else page + 1
 
-            activity_log = feedparser.parse(request.text).entries
-            if not activity_log:
+            counter = {}
+            try:
+                for date, link in _iter_activity_feed(
+                        r.iter_content(16384), counter):
+                    if link in seen:
+                        continue
+                    seen.add(link)
+                    yield date, link
+            finally:
+                r.close()
+            # past the last page, GitHub returns an empty feed
+            if not counter:
                 return
 
-            for record in activity_log:
-                for chunk in record['content']:
-                    for date, link in _extract_activity_feed_links(
-                            chunk['value'].encode('utf8')):
-                        yield date, link
+    def _timeline_pages(self, url, start=None):
+        """ Fetch and parse timeline pages one by one.
+        Pages are parsed while they are being downloaded.
+
+        Yields:
+            Tuple[List[dict], Optional[str]]: output of _parse_timeline_page()
+        """
+        while url:
+            r = self._request(url, stream=True)
+            try:
+                rows, url = _parse_timeline_stream(_iter_text(r), start)
+            finally:
+                r.close()
+            yield rows, url
+
+    def _pipelined_timeline_pages(self, url, start, parse_pool=None,
+                                  prefetch=1):
+        """ Fetch timeline pages in a background thread, so that parsing
+        and consuming the current page does not delay fetching of the next
+        one. The next page URL is scanned from the raw HTML, so the request
+        is issued as soon as the previous page is received.
+
+        Args:
+            url (str): first page URL
+            start (str): %Y-%m formatted month to stop at, if any
+            parse_pool (multiprocessing.Pool): pool to parse pages in.
+                By default, pages are parsed in the calling thread.
+            prefetch (int): max number of pages fetched ahead of the consumer
+
+        Yields:
+            Tuple[List[dict], Optional[str]]: output of _parse_timeline_page(),
+                in the page order
+        """
+        pages = six.moves.queue.Queue(maxsize=prefetch)
+        stopped = threading.Event()
+
+        def put(item):
+            return _put_until(pages, item, stopped)
 
-    def full_user_activity_timeline(self, user, start=None, to=None):
-        # type: (str, str, str) -> Generator[Tuple[str, Dict]]
+        def fetch(url):
+            try:
+                while url and not stopped.is_set():
+                    text = self._request(url).text
+                    url = _next_timeline_url(text, start)
+                    if parse_pool is not None:
+                        text = parse_pool.apply_async(
+                            _parse_timeline_page_worker,
+                            (text, start, HTML_PARSER))
+                    if not put(text):
+                        return
+            except Exception as e:
+                put(e)
+            else:
+                put(None)
+
+        fetcher = threading.Thread(target=fetch, args=(url,))
+        fetcher.daemon = True
+        fetcher.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                if parse_pool is None:
+                    rows, url = _parse_timeline_page(page, start)
+                else:
+                    rows, url = page.get()
+                yield rows, url
+                if not url:
+                    return
+        finally:
+            stopped.set()
+
+    def full_user_activity_timeline(self, user, start=None, to=None,
+                                    checkpoint=None, parse_pool=None,
+                                    prefetch=True, compact=False):
+        # type: (str, str, str, TimelineCheckpoint, multiprocessing.Pool, bool, bool) -> Generator[Union[Dict, ActivityRow]]
         """ Get a list of public user contributions, by month by repository.
 
         .. note: User timeline sometimes does not include all contributions.
@@ -547,6 +2434,25 @@ class Scraper(object):
             to (str): upper bound of date ranges to parse, same as `start`.
                 **Note**: the day is 1 by default, i.e. '2017-01'
                 will be interpreted as **1st** of January 2017.
+            checkpoint (TimelineCheckpoint): save progress after every page
+                and resume from the saved position, if any.
+                Rows emitted before the interruption are replayed first.
+            parse_pool (multiprocessing.Pool): if provided, pages are fetched
+                in a background thread and parsed in this process pool,
+                i.e. fetching of next pages is not blocked by parsing.
+                Rows are still yielded in order. It is useful if pages are
+                mostly served from the cache, so parsing is the bottleneck;
+                the same pool can be shared by many concurrent timelines.
+            prefetch (bool): request the next page in a background thread
+                as soon as the current one is received, so that the download
+                overlaps parsing and consuming the current page. Only one
+                page is fetched ahead. Set to False to fetch pages strictly
+                one at a time in the calling thread; pages are then parsed
+                month by month while they are being downloaded, so the full
+                page is never held in memory.
+            compact (bool): yield :py:class:`ActivityRow` named tuples with
+                all counters instead of dictionaries. They take much less
+                memory, which matters if many timelines are held in memory.
         Yields:
             Dict[str, int]:
                 A generator of activity dictionaries.
@@ -595,43 +2501,195 @@ class Scraper(object):
         <BLANKLINE>
         [114 rows x 7 columns]
         """
-        if start:
-            if not isinstance(start, datetime.datetime):
-                start = pd.to_datetime(start)
-            start = start.strftime('%Y-%m')
-        if to:
-            if not isinstance(to, datetime.datetime):  # str or unicode
-                to = pd.to_datetime(to)
-            now = to.strftime('%Y-%m-%d')
+        args = _timeline_checkpoint_args(start, to)
+        url, start = _timeline_url(user, start, to)
+        row = ActivityRow.from_dict if compact else lambda activity: activity
+        if checkpoint is not None:
+            saved_url, saved_rows = checkpoint.load(user, args)
+            if saved_url:
+                url = saved_url
+                for activity in saved_rows:
+                    yield row(activity)
+
+        if parse_pool is not None:
+            pages = self._pipelined_timeline_pages(url, start, parse_pool, 4)
+        elif prefetch:
+            pages = self._pipelined_timeline_pages(url, start)
         else:
-            now = datetime.datetime.now().strftime('%Y-%m-%d')
+            pages = self._timeline_pages(url, start)
+
+        for rows, url in pages:
+            if checkpoint is not None and url:
+                # yielded rows might be modified by the consumer
+                # (or concurrently, in bulk mode) before they are saved
+                saved_rows = [dict(activity) for activity in rows]
+            for activity in rows:
+                yield row(activity)
+            if checkpoint is not None and url:
+                checkpoint.save(user, args, url, saved_rows)
+
+        if checkpoint is not None:
+            checkpoint.clear(user)
+
+    def full_user_activity_timeline_frame(self, user, start=None, to=None,
+                                          **kwargs):
+        # type: (str, str, str, **object) -> pd.DataFrame
+        """ Get user activity timeline as a DataFrame
+
+        Unlike building a DataFrame from :py:meth:`full_user_activity_timeline`
+        output, rows are collected into typed column buffers as they are
+        parsed. The result is indexed by `month` and `repo` (categorical,
+        private contributions have NaN repo), and has a column for every
+        activity counter (COLUMNS) with the smallest integer dtype fitting
+        the values. Requires pandas.
+
+        Args:
+            user (str): GitHub login of the user to get activity for.
+            start (str): date to start with, see full_user_activity_timeline
+            to (str): upper bound of date ranges, see the same
+            **kwargs: other full_user_activity_timeline() arguments,
+                e.g. `checkpoint` or `prefetch`
 
-        url = '/%s?tab=overview&include_header=no&utf8=✓&from=%s&to=%s' % (
-            user, now[:8] + '01', now)
+        Returns:
+            pd.DataFrame: same data as the DataFrame built from
+                full_user_activity_timeline(), with zeros instead of NaNs.
 
-        while True:
-            soup = BeautifulSoup(self._request(url).text, 'html.parser')
-            for month_div in soup.find_all('div', class_='contribution-activity-listing'):
-                for month, data in _parse_timeline_update(month_div):
-                    if start and month < start:
+        Frames of many users can be combined with pd.concat():
+
+        >>> pd.concat([Scraper().full_user_activity_timeline_frame(user)
+        ...            for user in users], keys=users,
+        ...           names=['user'])  # doctest: +SKIP
+        """
+        return _timeline_frame(
+            self.full_user_activity_timeline(user, start, to, **kwargs))
+
+    def bulk_user_activity_timeline(self, users, start=None, to=None,
+                                    jobs=4, checkpoint=None):
+        # type: (Iterable[str], str, str, int, TimelineCheckpoint) -> Generator[Tuple[str, Optional[dict], Optional[Exception]]]
+        """ Get activity timelines of many users concurrently
+
+        Timelines are scraped by `jobs` worker threads sharing the rate
+        limit accounting, see :py:meth:`full_user_activity_timeline`.
+        Rows are yielded as soon as they are parsed, so rows of different
+        users are interleaved. A failure of one user does not affect others.
+
+        Args:
+            users (Iterable[str]): GitHub logins. It is consumed lazily,
+                so it can be e.g. an open file.
+            start (str): date to start with, see full_user_activity_timeline
+            to (str): upper bound of date ranges, see the same
+            jobs (int): number of users scraped concurrently
+            checkpoint (TimelineCheckpoint): save progress of every user
+                timeline, see full_user_activity_timeline
+
+        Yields:
+            Tuple[str, Optional[dict], Optional[Exception]]:
+                `(user, activity, None)` for every activity row,
+                `(user, None, None)` once the user timeline is completed,
+                `(user, None, exception)` if it failed.
+
+        >>> for user, activity, error in Scraper().bulk_user_activity_timeline(
+        ...         open('logins.txt')):  # doctest: +SKIP
+        ...     pass
+        """
+        users = iter(users)
+        users_lock = threading.Lock()
+        results = six.moves.queue.Queue(maxsize=jobs * 64)
+        stopped = threading.Event()
+
+        def put(item):
+            return _put_until(results, item, stopped)
+
+        def work():
+            while not stopped.is_set():
+                with users_lock:
+                    user = next(users, None)
+                if user is None:
+                    break
+                try:
+                    # prefetching is pointless, other workers fill the gaps
+                    for activity in self.full_user_activity_timeline(
+                            user, start, to, checkpoint, prefetch=False):
+                        if not put((user, activity, None)):
+                            return
+                except Exception as e:
+                    if not put((user, None, e)):
                         return
-                    for repo, activity in data.items():
-                        activity['repo'] = repo
-                        activity['month'] = month
-                        yield activity
-            form = soup.form
-            if not form:
-                break
-            url = form.attrs['data-url']
-            if not form.button:
-                break
+                else:
+                    if not put((user, None, None)):
+                        return
+            put(None)
+
+        workers = [threading.Thread(target=work) for _ in range(jobs)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        running = len(workers)
+        try:
+            while running:
+                item = results.get()
+                if item is None:
+                    running -= 1
+                    continue
+                yield item
+        finally:
+            stopped.set()
+
+    def map(self, method, items, jobs=8, return_exceptions=False):
+        # type: (Union[str, callable], Iterable, int, bool) -> Generator
+        """ Call a method for many arguments concurrently, in a thread pool
+
+        Args:
+            method (Union[str, callable]): a Scraper method name, e.g.
+                'project_contributor_stats', or any callable taking
+                a single argument. Generators, e.g. timelines, are consumed
+                in the pool and returned as lists.
+            items (Iterable): arguments, e.g. repository slugs or logins
+            jobs (int): number of concurrent calls
+            return_exceptions (bool): return exceptions as results instead
+                of raising the first one, like asyncio.gather()
+
+        Yields:
+            results, in the order of `items`
+
+        >>> for stats in Scraper().map(
+        ...         'project_contributor_stats', slugs):  # doctest: +SKIP
+        ...     pass
+        """
+        func = getattr(self, method) \
+            if isinstance(method, six.string_types) else method
+
+        def call(item):
+            try:
+                result = func(item)
+                if isinstance(result, types.GeneratorType):
+                    result = list(result)
+                return result
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        pool = ThreadPool(jobs)
+        try:
+            for result in pool.imap(call, items):
+                yield result
+        finally:
+            pool.terminate()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description="Get a user contribution timeline")
-    parser.add_argument('user', type=str,
+    parser.add_argument('user', type=str, nargs='?',
                         help='GitHub login of the user to parse')
+    parser.add_argument('-i', '--input', type=argparse.FileType('r'),
+                        help='Bulk mode: a file with GitHub logins, one per '
+                             'line, "-" for stdin. Output has an extra '
+                             '"user" column')
+    parser.add_argument('-j', '--jobs', default=4, type=int,
+                        help='Bulk mode: number of users to scrape '
+                             'concurrently, default: %(default)s')
     parser.add_argument('--from', type=str, nargs='?',
                         help='Lower end of the date range, default: no limit')
     parser.add_argument('--to', type=str, nargs='?',
@@ -639,16 +2697,50 @@ if __name__ == '__main__':
     parser.add_argument('-o', '--output', default="-",
                         type=argparse.FileType('w'),
                         help='Output filename, "-" or skip for stdin')
+    parser.add_argument('-f', '--format', default='csv',
+                        choices=TimelineWriter.formats,
+                        help='Output format, default: %(default)s')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help="Log progress to stderr")
     args = parser.parse_args()
+    if not args.user and not args.input:
+        parser.error("either user or --input is required")
 
     logging.basicConfig(format='%(asctime)s %(message)s',
                         level=logging.INFO if args.verbose else logging.WARNING)
 
-    COLUMNS = ('commits', 'issues', 'pull_requests', 'reviews',
-               'private_contrib', 'created_repository', 'joined_org')
-
-    df = pd.DataFrame(Scraper().full_user_activity_timeline(args.user))
-    df = df.set_index(['month', 'repo']).fillna(0).astype(int)
-    df.to_csv(args.output)
+    if args.input:
+        logins = (line.strip() for line in args.input)
+        logins = (login for login in logins
+                  if login and not login.startswith('#'))
+        writer = TimelineWriter(args.output, args.format,
+                                ('user', 'month', 'repo'))
+        row_counts = defaultdict(int)
+        completed = 0
+        failures = []
+        for user, activity, error in Scraper().bulk_user_activity_timeline(
+                logins, getattr(args, 'from'), args.to, args.jobs):
+            if activity is not None:
+                row_counts[user] += 1
+                activity['user'] = user
+                writer.write(activity)
+            elif error is None:
+                completed += 1
+                print("%s: done, %d rows" % (user, row_counts.pop(user, 0)),
+                      file=sys.stderr)
+            else:
+                row_counts.pop(user, None)
+                failures.append((user, error))
+                print("%s: failed: %s" % (user, error), file=sys.stderr)
+
+        print("%d users completed, %d failed" % (completed, len(failures)),
+              file=sys.stderr)
+        if failures:
+            for user, error in failures:
+                print("%s\t%s" % (user, error), file=sys.stderr)
+            sys.exit(1)
+    else:
+        writer = TimelineWriter(args.output, args.format)
+        for activity in Scraper().full_user_activity_timeline(
+                args.user, getattr(args, 'from'), args.to):
+            writer.write(activity)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+"""
+asyncio counterpart of :py:class:`stgithub.Scraper`.
+
+Most of the time spent scraping is waiting for the network and for the rate
+limit. :py:class:`AsyncScraper` shares rate limit accounting with
+:py:class:`stgithub.Scraper`, so many users can be scraped concurrently in
+a single event loop without exceeding GitHub limits:
+
+>>> async def timelines(users):
+...     scraper = AsyncScraper()
+...     return await asyncio.gather(*(
+...         scraper.user_daily_contrib_num(user, 2018) for user in users))
+
+HTTP requests are still issued by `requests`, in a thread pool executor.
+However, threads are only occupied for the duration of the actual HTTP
+request; waiting for the rate limit does not block anything.
+
+Requires Python 3.6+.
+
+.. autoclass:: AsyncScraper
+    :members: full_user_activity_timeline, project_contributor_stats,
+        user_daily_contrib_num, user_daily_contrib_range,
+        links_to_recent_user_activity
+
+"""
+
+import asyncio
+import logging
+import warnings
+
+import stgithub
+
+
+class AsyncScraper(object):
+    """ asyncio interface to "unofficial GitHub API"
+
+    Args:
+        scraper (stgithub.Scraper): blocking scraper to share identities
+            (sessions and rate limit accounting) with. By default, the
+            :py:class:`stgithub.Scraper` singleton is used.
+        executor (concurrent.futures.Executor): executor to run HTTP
+            requests in. By default, the event loop default executor is used.
+    """
+    def __init__(self, scraper=None, executor=None):
+        self.scraper = scraper or stgithub.Scraper()
+        self.executor = executor
+
+    async def _request(self, url, params=None, headers=None):
+        headers = headers or stgithub.HEADERS
+
+        base_url = self.scraper.base_url
+        if not url.startswith(base_url):
+            url = base_url + url
+
+        cached, request_headers = self.scraper._cache_lookup(
+            url, params, headers)
+        if cached is not None and cached.fresh:
+            return cached.response()
+
+        loop = asyncio.get_event_loop()
+        while True:
+            identity, sleep_interval = self.scraper._reserve()
+            if sleep_interval > 0:
+                logging.info("Hibernating for %.2f seconds to maintain "
+                             "GitHub XHR rate limit..", sleep_interval)
+                self.scraper.metrics.emit('hibernate', seconds=sleep_interval)
+                await asyncio.sleep(sleep_interval)
+
+            r = await loop.run_in_executor(
+                self.executor, self.scraper._get, url, params, request_headers,
+                identity.session)
+
+            if r.status_code == 429:
+                delay = identity.limiter.on_rate_limited(r.headers)
+                logging.info("Hit GitHub XHR rate limit, identity is blocked "
+                             "for %.2f seconds..", delay)
+                self.scraper.metrics.emit('rate_limited', url=url)
+                continue
+
+            identity.limiter.on_response(r.headers)
+            break
+
+        return self.scraper._cache_update(url, params, headers, cached, r)
+
+    async def project_contributor_stats(self, repo_slug, columnar=False):
+        """ See :py:meth:`stgithub.Scraper.project_contributor_stats` """
+        delays = self.scraper._stats_poll_delays()
+        while True:
+            r = await self._request("/%s/graphs/contributors-data" % repo_slug)
+            try:
+                res = r.json()
+            except ValueError:
+                # GitHub is still computing the stats
+                delay = next(delays, None)
+                if delay is None:
+                    raise stgithub.GitHubScrapingError(
+                        "GitHub returns empty responses. Try again later.")
+                await asyncio.sleep(delay)
+            else:
+                if columnar:
+                    return stgithub._contributor_stats_columns(res)
+                return res
+
+    async def user_daily_contrib_num(self, user, year, compact=False):
+        """ See :py:meth:`stgithub.Scraper.user_daily_contrib_num` """
+        url = "/users/%s/contributions?from=%d-12-01&to=%d-12-31&full_graph=1" \
+              % (user, year, year)
+        r = await self._request(url)
+        return stgithub._parse_contrib_calendar(r.text, year, compact)
+
+    async def user_daily_contrib_range(self, user, start, end=None,
+                                       compact=False):
+        """ See :py:meth:`stgithub.Scraper.user_daily_contrib_range`
+
+        Calendar requests for the range are issued concurrently.
+        """
+        start, end = stgithub._date_range(start, end)
+        ranges = stgithub._plan_contrib_requests(start, end)
+        responses = await asyncio.gather(*(
+            self._request(stgithub._contrib_range_url(user, from_date, to_date))
+            for from_date, to_date in ranges))
+        days = []
+        for r, (from_date, to_date) in zip(responses, ranges):
+            days.extend(stgithub._parse_contrib_range(r.text, from_date, to_date))
+        days.sort()
+        if compact:
+            return stgithub._compact_contrib_calendar(days)
+        return dict(days)
+
+    async def links_to_recent_user_activity(self, user):
+        """ See :py:meth:`stgithub.Scraper.links_to_recent_user_activity`
+
+        This method is an asynchronous generator:
+
+        >>> async for date, link in scraper.links_to_recent_user_activity(u):
+        ...     pass
+        """
+        warnings.warn(
+            "This method is know to return incomplete data."
+            "Proceed with caution.", DeprecationWarning)
+
+        seen = stgithub._BoundedSet(self.scraper.feed_dedup_size)
+        page = None
+        for _ in range(self.scraper.feed_max_pages):
+            request = await self._request(
+                '/%s' % user, params={'page': page},
+                headers={'Accept': 'application/atom+xml'})
+            page = 1 if page is None else page + 1
+
+            counter = {}
+            for date, link in stgithub._iter_activity_feed(
+                    [request.content], counter):
+                if link in seen:
+                    continue
+                seen.add(link)
+                yield date, link
+            # past the last page, GitHub returns an empty feed
+            if not counter:
+                return
+
+    async def full_user_activity_timeline(self, user, start=None, to=None,
+                                          checkpoint=None, compact=False):
+        """ See :py:meth:`stgithub.Scraper.full_user_activity_timeline`
+
+        The next page is requested as soon as the current one is received.
+        This method is an asynchronous generator:
+
+        >>> async for activity in scraper.full_user_activity_timeline(u):
+        ...     pass
+        """
+        args = stgithub._timeline_checkpoint_args(start, to)
+        url, start = stgithub._timeline_url(user, start, to)
+        row = stgithub.ActivityRow.from_dict if compact \
+            else lambda activity: activity
+        if checkpoint is not None:
+            saved_url, saved_rows = checkpoint.load(user, args)
+            if saved_url:
+                url = saved_url
+                for activity in saved_rows:
+                    yield row(activity)
+
+        request = url and asyncio.ensure_future(self._request(url))
+        try:
+            while request:
+                text = (await request).text
+                # request the next page before parsing this one
+                next_url = stgithub._next_timeline_url(text, start)
+                request = next_url and asyncio.ensure_future(
+                    self._request(next_url))
+                rows, url = stgithub._parse_timeline_page(text, start)
+                if checkpoint is not None and url:
+                    # yielded rows might be modified by the consumer
+                    saved_rows = [dict(activity) for activity in rows]
+                for activity in rows:
+                    yield row(activity)
+                if not url:
+                    break
+                if checkpoint is not None:
+                    checkpoint.save(user, args, url, saved_rows)
+        finally:
+            if request:
+                request.cancel()
+
+        if checkpoint is not None:
+            checkpoint.clear(user)
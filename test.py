@@ -1,18 +1,33 @@
 #!/usr/bin/env python
 
 import csv
+import datetime
 import json
+import multiprocessing
 import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 from typing import Generator
 import unittest
+import warnings
 
 from bs4 import BeautifulSoup
 import pandas as pd
+import requests
 import six
 
 import stgithub
 
 
+def fh_text(path):
+    with open(path) as fh:
+        return fh.read()
+
+
 class TestGitHub(unittest.TestCase):
 
     def setUp(self):
@@ -38,6 +53,30 @@ class TestGitHub(unittest.TestCase):
         self.assertEqual(
             stgithub.normalize_text("\nHello   world  \t\n!"), 'Hello world !')
 
+    def test_parse_month_heading(self):
+        self.assertEqual(stgithub.parse_month("December 2018"), '2018-12')
+        self.assertEqual(stgithub.parse_month("\n  May\n 2005 "), '2005-05')
+        self.assertRaises(ValueError, stgithub.parse_month, "Foo 2018")
+
+    def test_parse_date(self):
+        self.assertEqual(stgithub.parse_date('2017-01'),
+                         datetime.date(2017, 1, 1))
+        self.assertEqual(stgithub.parse_date('2017-01-31'),
+                         datetime.date(2017, 1, 31))
+        self.assertEqual(stgithub.parse_date(' Jan 9, 2019\n'),
+                         datetime.date(2019, 1, 9))
+        self.assertEqual(stgithub.parse_date('March 10 2015'),
+                         datetime.date(2015, 3, 10))
+        now = datetime.datetime.now()
+        self.assertIs(stgithub.parse_date(now), now)
+        self.assertRaises(ValueError, stgithub.parse_date, 'yesterday')
+
+    def test_lazy_imports(self):
+        code = "import sys, stgithub; print(' '.join(sorted(" \
+               "m for m in ('pandas', 'bs4', 'feedparser') if m in sys.modules)))"
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.strip(), b'')
+
     def test_extract_repo(self):
         self.assertEqual(stgithub.extract_repo("/org/repo"), 'org/repo')
         self.assertEqual(
@@ -67,6 +106,26 @@ class TestGitHub(unittest.TestCase):
             )
         fh.close()
 
+    def test_record_handlers(self):
+        text = '<div><h4>Starred a repository <a href="/org/repo">org/repo' \
+               '</a></h4></div>'
+        tree = BeautifulSoup(text, 'html.parser')
+        self.assertRaises(
+            ValueError, stgithub._parse_timeline_update_record, tree)
+
+        handlers = stgithub.RECORD_HANDLERS['h4'][:]
+        try:
+            @stgithub.register_record_handler('h4', r'Starred a repository')
+            def _record_starred(record_div, title, record_data):
+                record_data[record_div.h4.a.text]['stars'] += 1
+
+            self.assertDictEqual(
+                stgithub._parse_timeline_update_record(tree),
+                {'org/repo': {'stars': 1}})
+        finally:
+            stgithub.RECORD_HANDLERS['h4'] = handlers
+            stgithub._RECORD_DISPATCH.pop('h4', None)
+
     def test_parse_month(self):
         fixtures_dir = os.path.join(self.fixtures_dir, 'month')
         for fname in os.listdir(fixtures_dir):
@@ -84,6 +143,787 @@ class TestGitHub(unittest.TestCase):
             self.assertIsInstance(chunk, dict)
             self._test_datestring(month, True)
 
+    def test_parser_backends(self):
+        try:
+            import lxml
+        except ImportError:
+            self.skipTest("lxml is not installed")
+
+        def parse_fixtures():
+            results = []
+            for dirname in ('record', 'month'):
+                fixtures_dir = os.path.join(self.fixtures_dir, dirname)
+                for fname in sorted(os.listdir(fixtures_dir)):
+                    if not fname.endswith('.html'):
+                        continue
+                    text = fh_text(os.path.join(fixtures_dir, fname))
+                    tree = stgithub._soup(text)
+                    if dirname == 'record':
+                        results.append(
+                            stgithub._parse_timeline_update_record(tree))
+                    else:
+                        results.append(
+                            list(stgithub._parse_timeline_update(tree)))
+                        results.append(stgithub._parse_timeline_page(text))
+            fpath = os.path.join(self.fixtures_dir, 'activity_feed', 'chunk.html')
+            results.append(list(stgithub._extract_activity_feed_links(
+                fh_text(fpath).encode('utf8'))))
+            # empty responses
+            for text in ('', ' \n', b''):
+                results.append(stgithub._parse_timeline_page(text))
+                results.append(list(stgithub._parse_timeline_update(
+                    stgithub._soup(text))))
+            return results
+
+        default_parser = stgithub.HTML_PARSER
+        try:
+            expected = parse_fixtures()
+            for parser in ('lxml', 'lxml.html'):
+                stgithub.HTML_PARSER = parser
+                self.assertEqual(expected, parse_fixtures(),
+                                 "Results differ for %s parser" % parser)
+        finally:
+            stgithub.HTML_PARSER = default_parser
+
+    def test_parse_timeline_page(self):
+        fixtures_dir = os.path.join(self.fixtures_dir, 'month')
+        rows, next_url = stgithub._parse_timeline_page(fh_text(
+            os.path.join(fixtures_dir, 'two_months.html')))
+        self.assertGreater(len(rows), 0)
+        self.assertTrue(all('month' in row and 'repo' in row for row in rows))
+        self.assertEqual(
+            next_url, '/user2589?tab=overview&from=2017-01-01&to=2017-01-31')
+
+        rows, next_url = stgithub._parse_timeline_page(fh_text(
+            os.path.join(fixtures_dir, 'two_months.html')), '2100-01')
+        self.assertEqual(rows, [])
+        self.assertIsNone(next_url)
+
+        # no "show more activity" button on the last page
+        _, next_url = stgithub._parse_timeline_page(fh_text(
+            os.path.join(fixtures_dir, 'end_of_feed.html')))
+        self.assertIsNone(next_url)
+
+    def test_parse_timeline_stream(self):
+        fixtures_dir = os.path.join(self.fixtures_dir, 'month')
+        for fname in sorted(os.listdir(fixtures_dir)):
+            if not fname.endswith('.html'):
+                continue
+            text = fh_text(os.path.join(fixtures_dir, fname))
+            for start in (None, '2017-01', '2100-01'):
+                expected = stgithub._parse_timeline_page(text, start)
+                for size in (1, 7, 100, 4096, len(text)):
+                    chunks = (text[i:i + size]
+                              for i in range(0, len(text), size))
+                    self.assertEqual(
+                        stgithub._parse_timeline_stream(chunks, start),
+                        expected, "%s, chunks of %d" % (fname, size))
+
+        # a page with no months, only the "Show more activity" form
+        text = fh_text(os.path.join(fixtures_dir, 'two_months.html'))
+        form = text[text.find('<form'):text.rfind('</form>') + 7]
+        text = '<div class="profile-timeline">...</div>' + form
+        expected = stgithub._parse_timeline_page(text)
+        self.assertIsNotNone(expected[1])
+        for size in (1, 7, 100, len(text)):
+            chunks = (text[i:i + size] for i in range(0, len(text), size))
+            self.assertEqual(stgithub._parse_timeline_stream(chunks), expected,
+                             "form only, chunks of %d" % size)
+
+    def test_next_timeline_url(self):
+        fixtures_dir = os.path.join(self.fixtures_dir, 'month')
+        for fname in os.listdir(fixtures_dir):
+            text = fh_text(os.path.join(fixtures_dir, fname))
+            self.assertEqual(stgithub._next_timeline_url(text),
+                             stgithub._parse_timeline_page(text)[1])
+        text = fh_text(os.path.join(fixtures_dir, 'two_months.html'))
+        # next page is for January 2017
+        self.assertIsNotNone(stgithub._next_timeline_url(text, '2017-01'))
+        self.assertIsNone(stgithub._next_timeline_url(text, '2017-02'))
+
+    def test_pipelined_timeline(self):
+        fixtures_dir = os.path.join(self.fixtures_dir, 'month')
+        pages = {
+            None: 'two_months.html',
+            '/user2589?tab=overview&from=2017-01-01&to=2017-01-31':
+                'untitled.html',
+            '/user2589?tab=overview&from=2018-08-01&to=2018-08-31':
+                'end_of_feed.html',
+        }
+
+        def request(url, stream=False):
+            fname = pages.get(url, pages[None])
+            response = requests.Response()
+            response._content = fh_text(
+                os.path.join(fixtures_dir, fname)).encode('utf8')
+            response._content_consumed = True
+            response.encoding = 'utf8'
+            return response
+
+        self.scraper._request = request
+        pool = multiprocessing.Pool(2)
+        try:
+            expected = list(self.scraper.full_user_activity_timeline(
+                self.user, to='2017-03-31', prefetch=False))
+            self.assertEqual(len(expected), 6)
+            # prefetching the next page in a background thread
+            results = list(self.scraper.full_user_activity_timeline(
+                self.user, to='2017-03-31'))
+            self.assertEqual(expected, results)
+            results = list(self.scraper.full_user_activity_timeline(
+                self.user, to='2017-03-31', parse_pool=pool))
+            self.assertEqual(expected, results)
+            # stop early
+            gen = self.scraper.full_user_activity_timeline(
+                self.user, to='2017-03-31', parse_pool=pool)
+            self.assertEqual(next(gen), expected[0])
+            gen.close()
+        finally:
+            pool.terminate()
+            del self.scraper._request
+
+    def test_bulk_user_activity_timeline(self):
+        def timeline(user, start=None, to=None, checkpoint=None,
+                     prefetch=True):
+            if user == 'missing':
+                raise requests.HTTPError("404 Client Error")
+            for month in ('2018-01', '2018-02'):
+                yield {'month': month, 'repo': user + '/repo', 'commits': 1}
+
+        self.scraper.full_user_activity_timeline = timeline
+        try:
+            results = list(self.scraper.bulk_user_activity_timeline(
+                ['user1', 'missing', 'user2', 'user3'], jobs=2))
+        finally:
+            del self.scraper.full_user_activity_timeline
+
+        for user in ('user1', 'user2', 'user3'):
+            user_results = [(activity, error)
+                            for login, activity, error in results
+                            if login == user]
+            self.assertEqual(len(user_results), 3)
+            # completion is reported after all rows of the user
+            self.assertEqual(user_results[-1], (None, None))
+            self.assertEqual(user_results[0][0]['repo'], user + '/repo')
+        failed = [(activity, error) for login, activity, error in results
+                  if login == 'missing']
+        self.assertEqual(len(failed), 1)
+        self.assertIsNone(failed[0][0])
+        self.assertIsInstance(failed[0][1], requests.HTTPError)
+
+    def test_rate_limiter(self):
+        limiter = stgithub.RateLimiter(3, 60)
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.reserve(), 60, delta=1)
+        self.assertAlmostEqual(limiter.reserve(), 60, delta=1)
+
+    def test_adaptive_rate_limiter(self):
+        limiter = stgithub.RateLimiter(4, 60, max_limit=5)
+        for _ in range(4):
+            limiter.on_response({})
+        self.assertEqual(limiter.max_size, 5)
+        for _ in range(5):
+            limiter.on_response({})
+        self.assertEqual(limiter.max_size, 5)  # max_limit
+        # probing above the default rate limit is opt-in
+        self.assertEqual(stgithub.Scraper(shared=False).limiter.max_limit,
+                         stgithub.Scraper.queue_max_size)
+
+        # multiplicative decrease, blocked for Retry-After seconds
+        self.assertEqual(limiter.on_rate_limited({'Retry-After': '30'}), 30)
+        self.assertEqual(limiter.max_size, 2)
+        self.assertAlmostEqual(limiter.next_slot(), time.time() + 30, delta=1)
+        self.assertAlmostEqual(limiter.reserve(), 30, delta=1)
+        # concurrent requests rejected during the block are ignored
+        self.assertAlmostEqual(limiter.on_rate_limited({}), 30, delta=1)
+        self.assertEqual(limiter.max_size, 2)
+        # exponential backoff with jitter if there is no Retry-After
+        for attempt in range(3):
+            limiter.blocked_until = 0  # the block is over
+            delay = limiter.on_rate_limited({})
+            base = limiter.backoff_base * 2 ** (attempt + 1)
+            self.assertTrue(base / 2 <= delay <= base)
+        self.assertEqual(limiter.max_size, 1)
+        limiter.on_response({})
+        self.assertEqual(limiter.penalties, 0)
+
+        # exhausted budget reported by the server
+        limiter = stgithub.RateLimiter(4, 60)
+        reset = time.time() + 100
+        limiter.on_response({'X-RateLimit-Remaining': '0',
+                             'X-RateLimit-Reset': str(int(reset))})
+        self.assertAlmostEqual(limiter.reserve(), 100, delta=1)
+        limiter.on_response({'RateLimit-Remaining': '0',
+                             'RateLimit-Reset': '200'})
+        self.assertAlmostEqual(limiter.next_slot(), reset + 100, delta=1)
+
+    def test_identities(self):
+        identities = self.scraper.identities[:]
+        try:
+            extra = self.scraper.add_identity(queue_max_size=2)
+            self.assertEqual(extra.limiter.max_size, 2)
+            self.assertEqual(extra.limiter.time_length,
+                             self.scraper.queue_time_length)
+            # exhaust the default identity budget
+            for _ in range(self.scraper.queue_max_size):
+                self.scraper.limiter.reserve()
+            for _ in range(2):
+                identity, sleep_interval = self.scraper._reserve()
+                self.assertIs(identity, extra)
+                self.assertEqual(sleep_interval, 0)
+            # now both are exhausted; the one freed earlier is preferred
+            identity, sleep_interval = self.scraper._reserve()
+            self.assertIs(identity, identities[0])
+            self.assertGreater(sleep_interval, 0)
+        finally:
+            self.scraper.identities[:] = identities
+            self.scraper.limiter.timestamps.clear()
+
+    def test_metrics(self):
+        def response(status, content=b''):
+            r = requests.Response()
+            r.status_code = status
+            r._content = content
+            return r
+
+        class FakeSession(object):
+            responses = [response(502), response(200, b'x' * 2048)]
+
+            def get(self, url, headers=None, params=None, stream=False):
+                return self.responses.pop(0)
+
+        metrics = self.scraper.metrics
+        self.scraper.metrics = stgithub.Metrics()
+        self.scraper.retry_backoff_base = 0
+        try:
+            events = []
+            self.scraper.metrics.add_hook(
+                lambda event, data: events.append((event, data)))
+            r = self.scraper._get('https://github.com/foo', session=FakeSession())
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual([event for event, _ in events],
+                             ['response', 'retry', 'response'])
+            self.assertEqual(events[1][1]['reason'], 'server_error')
+            self.assertEqual(events[2][1]['bytes'], 2048)
+            self.scraper.metrics.emit('hibernate', seconds=1.5)
+            self.scraper.metrics.emit('rate_limited', url='foo')
+
+            text = self.scraper.metrics.prometheus()
+            for line in ('stgithub_responses_total{status="200"} 1',
+                         'stgithub_responses_total{status="502"} 1',
+                         'stgithub_retries_total{reason="server_error"} 1',
+                         'stgithub_rate_limited_total 1',
+                         'stgithub_hibernate_seconds_total 1.5',
+                         'stgithub_response_size_bytes_bucket{le="1024"} 1',
+                         'stgithub_response_size_bytes_bucket{le="10240"} 2',
+                         'stgithub_request_duration_seconds_count 2'):
+                self.assertIn(line, text.splitlines())
+        finally:
+            self.scraper.metrics = metrics
+            del self.scraper.retry_backoff_base
+
+    def test_response_cache(self):
+        cache = stgithub.ResponseCache(
+            ':memory:', ttl=[('/graphs/', 3600)])
+        url = stgithub.BASE_URL + '/pandas-dev/pandas/graphs/contributors-data'
+        self.assertIsNone(cache.lookup(url))
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = b'[{"total": 1}]'
+        response.encoding = 'utf8'
+        response.headers['ETag'] = 'W/"abc"'
+        cache.store(url, None, None, response)
+
+        cached = cache.lookup(url)
+        self.assertTrue(cached.fresh)
+        self.assertEqual(cached.response().json(), [{'total': 1}])
+        self.assertEqual(b''.join(cached.response().iter_content(4)),
+                         b'[{"total": 1}]')
+        self.assertEqual(cached.validators(), {'If-None-Match': 'W/"abc"'})
+        # different headers or parameters are different cache entries
+        self.assertIsNone(cache.lookup(url, headers={'Accept': 'text/html'}))
+        self.assertIsNone(cache.lookup(url, params={'page': 2}))
+
+        url = stgithub.BASE_URL + '/user2589'
+        response.url = url
+        cache.store(url, None, None, response)
+        self.assertFalse(cache.lookup(url).fresh)
+
+        # empty responses are not cached
+        response._content = b''
+        cache.store(url + '2', None, None, response)
+        self.assertIsNone(cache.lookup(url + '2'))
+
+    def test_parse_contrib_calendar(self):
+        text = fh_text(
+            os.path.join(self.fixtures_dir, 'calendar', 'contributions.html'))
+        contribs = stgithub._parse_contrib_calendar(text, 2018)
+        self.assertEqual(len(contribs), 365)
+        self.assertTrue(all(self._test_datestring(k) for k in contribs.keys()))
+        self.assertEqual(sum(contribs.values()), 3245)
+        self.assertEqual(contribs['2018-06-14'], 1234)
+        self.assertEqual(stgithub._parse_contrib_calendar(text, 2017),
+                         {'2017-12-31': 0})
+
+        start, counts = stgithub._parse_contrib_calendar(text, 2018, True)
+        self.assertEqual(start, datetime.date(2018, 1, 1))
+        self.assertEqual(len(counts), 365)
+        self.assertEqual(
+            [contribs[(start + datetime.timedelta(days=i)).isoformat()]
+             for i in range(365)], counts.tolist())
+
+        start, counts = stgithub._parse_contrib_calendar(text, 2019, True)
+        self.assertIsNone(start)
+        self.assertEqual(len(counts), 0)
+
+    def test_plan_contrib_requests(self):
+        start = datetime.date(2010, 1, 1)
+        end = datetime.date(2019, 12, 31)
+        ranges = stgithub._plan_contrib_requests(start, end)
+        # ten years, one request per 53 weeks
+        self.assertEqual(len(ranges), 10)
+        self.assertEqual(ranges[0][1], end)
+        self.assertEqual(ranges[-1][0], start)
+        for (from_date, _), (_, to_date) in zip(ranges, ranges[1:]):
+            self.assertEqual(from_date - to_date, datetime.timedelta(days=1))
+        self.assertEqual(stgithub._plan_contrib_requests(end, start), [])
+
+        text = fh_text(
+            os.path.join(self.fixtures_dir, 'calendar', 'contributions.html'))
+        days = stgithub._parse_contrib_range(
+            text, datetime.date(2018, 6, 14), datetime.date(2018, 6, 20))
+        self.assertEqual(len(days), 7)
+        self.assertEqual(days[0], ('2018-06-14', 1234))
+
+    def test_contributor_stats_columns(self):
+        stats = [
+            {'author': {'login': 'alice', 'id': 1}, 'total': 3,
+             'weeks': [{'w': 100, 'a': 10, 'd': 1, 'c': 2},
+                       {'w': 200, 'a': 0, 'd': 0, 'c': 0},
+                       {'w': 300, 'a': 5, 'd': 7, 'c': 1}]},
+            {'author': None, 'total': 1,
+             'weeks': [{'w': 200, 'a': 4, 'd': 0, 'c': 1},
+                       {'w': 300, 'a': 0, 'd': 0, 'c': 0}]},
+        ]
+        columns = stgithub._contributor_stats_columns(stats)
+        self.assertEqual(columns['weeks'].tolist(), [100, 200, 300])
+        self.assertEqual(columns['logins'].tolist(), ['alice', None])
+        self.assertEqual(columns['ids'].tolist(), [1, -1])
+        self.assertEqual(columns['totals'].tolist(), [3, 1])
+        self.assertEqual(columns['additions'].tolist(),
+                         [[10, 0], [0, 4], [5, 0]])
+        self.assertEqual(columns['deletions'].tolist(),
+                         [[1, 0], [0, 0], [7, 0]])
+        self.assertEqual(columns['commits'].sum(axis=0).tolist(), [3, 1])
+
+    def test_activity_row(self):
+        text = fh_text(os.path.join(self.fixtures_dir, 'month',
+                                    'two_months.html'))
+        activity = stgithub._parse_timeline_page(text)[0][0]
+        row = stgithub.ActivityRow.from_dict(activity)
+        self.assertEqual(row.month, activity['month'])
+        self.assertEqual(row.repo, activity['repo'])
+        self.assertEqual(row.commits, activity['commits'])
+        self.assertEqual(row.get('issues'), 0)
+        self.assertEqual(len(row), 2 + len(stgithub.COLUMNS))
+        # strings are shared between rows
+        other = stgithub.ActivityRow.from_dict(
+            stgithub._parse_timeline_page(text)[0][0])
+        self.assertIs(row.repo, other.repo)
+        self.assertIs(row.month, other.month)
+
+        private = stgithub.ActivityRow.from_dict(
+            {'month': '2018-01', 'repo': None, 'private_contrib': 2})
+        self.assertIsNone(private.repo)
+        df = pd.DataFrame([row, private])
+        self.assertEqual(tuple(df.columns), stgithub.ActivityRow._fields)
+
+        fh = six.StringIO()
+        stgithub.TimelineWriter(fh).write(row)
+        self.assertEqual(fh.getvalue().splitlines()[1],
+                         ",".join(str(value) for value in row))
+
+    def test_timeline_frame(self):
+        rows = []
+        fixtures_dir = os.path.join(self.fixtures_dir, 'month')
+        for fname in sorted(os.listdir(fixtures_dir)):
+            if fname.endswith('.html'):
+                rows.extend(stgithub._parse_timeline_page(
+                    fh_text(os.path.join(fixtures_dir, fname)))[0])
+        rows.append({'month': '2018-01', 'repo': None, 'private_contrib': 300})
+
+        df = stgithub._timeline_frame(iter(rows))
+        self.assertEqual(list(df.index.names), ['month', 'repo'])
+        self.assertEqual(tuple(df.columns), stgithub.COLUMNS)
+        self.assertEqual(df.index.get_level_values('repo').dtype, 'category')
+        self.assertEqual(df['commits'].dtype, 'int8')
+        self.assertEqual(df['private_contrib'].dtype, 'int16')
+        self.assertTrue(pd.isnull(df.index[-1][1]))
+
+        expected = pd.DataFrame(rows).set_index(['month', 'repo'])
+        expected = expected.reindex(columns=stgithub.COLUMNS)
+        self.assertEqual(df.values.tolist(),
+                         expected.fillna(0).astype(int).values.tolist())
+        self.assertEqual(
+            [(month, repo) for month, repo in df.index[:-1]],
+            [(month, repo) for month, repo in expected.index[:-1]])
+
+        empty = stgithub._timeline_frame([])
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(tuple(empty.columns), stgithub.COLUMNS)
+
+    def test_timeline_writer(self):
+        rows = [{'month': '2018-01', 'repo': 'org/repo', 'commits': 3},
+                {'month': '2018-01', 'repo': None, 'private_contrib': 2}]
+        fh = six.StringIO()
+        writer = stgithub.TimelineWriter(fh)
+        self.assertEqual(fh.getvalue().strip(),
+                         ",".join(('month', 'repo') + stgithub.COLUMNS))
+        for row in rows:
+            writer.write(row)
+        lines = fh.getvalue().splitlines()
+        self.assertEqual(lines[1:], ['2018-01,org/repo,3,0,0,0,0,0,0',
+                                     '2018-01,,0,0,0,0,2,0,0'])
+
+        fh = six.StringIO()
+        writer = stgithub.TimelineWriter(
+            fh, 'jsonl', ('user', 'month', 'repo'), ('commits', 'issues'))
+        writer.write(dict(rows[0], user='user2589'))
+        self.assertEqual(
+            fh.getvalue(), '{"user": "user2589", "month": "2018-01", '
+                           '"repo": "org/repo", "commits": 3, "issues": 0}\n')
+        self.assertRaises(ValueError, stgithub.TimelineWriter, fh, 'xml')
+
+    def test_timeline_checkpoint(self):
+        fixtures_dir = os.path.join(self.fixtures_dir, 'month')
+        pages = [fh_text(os.path.join(fixtures_dir, fname))
+                 for fname in ('two_months.html', 'end_of_feed.html')]
+        requested = []
+
+        def request(url, stream=False):
+            requested.append(url)
+            if len(requested) > 1 and fail:
+                raise stgithub.GitHubScrapingError("Network is down")
+            response = requests.Response()
+            # the first page is requested up to `to`
+            page = pages['to=2017-03-31' not in url]
+            response._content = page.encode('utf8')
+            response._content_consumed = True
+            response.encoding = 'utf8'
+            return response
+
+        path = tempfile.mkdtemp()
+        checkpoint = stgithub.TimelineCheckpoint(path)
+        self.scraper._request = request
+        try:
+            fail = True
+            gen = self.scraper.full_user_activity_timeline(
+                self.user, to='2017-03-31', checkpoint=checkpoint)
+            first_page = []
+            with self.assertRaises(stgithub.GitHubScrapingError):
+                for activity in gen:
+                    first_page.append(dict(activity))
+                    # changes made by the consumer are not saved
+                    activity['user'] = self.user
+            self.assertGreater(len(first_page), 0)
+            url, rows = checkpoint.load(self.user, ['None', '2017-03-31'])
+            self.assertIsNone(url)
+            url, rows = checkpoint.load(self.user, [None, '2017-03-31'])
+            self.assertEqual(
+                url, '/user2589?tab=overview&from=2017-01-01&to=2017-01-31')
+            self.assertEqual(rows, first_page)
+
+            fail = False
+            del requested[:]
+            results = list(self.scraper.full_user_activity_timeline(
+                self.user, to='2017-03-31', checkpoint=checkpoint))
+            self.assertEqual(requested, [url])
+            self.assertEqual(results[:len(first_page)], first_page)
+            self.assertEqual(len(results), len(first_page) + 1)
+            # completed timeline checkpoints are removed
+            self.assertEqual(os.listdir(path), [])
+        finally:
+            del self.scraper._request
+            shutil.rmtree(path)
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_fake_github(self):
+        import fake_github
+
+        identities = self.scraper.identities[:]
+        self.scraper.identities[:] = [stgithub.Identity(40, 121)]
+        self.scraper.retry_backoff_base = 0
+        server = fake_github.FakeGitHub(timeline_months=6).start()
+        self.scraper.base_url = server.url
+        try:
+            rows = list(self.scraper.full_user_activity_timeline(
+                self.user, prefetch=False))
+            self.assertEqual(len({row['month'] for row in rows}), 6)
+            self.assertEqual(server.stats[200], 6)
+            # start cutoff
+            start = rows[2]['month']
+            rows = list(self.scraper.full_user_activity_timeline(
+                self.user, start=start))
+            self.assertEqual(min(row['month'] for row in rows), start)
+            df = self.scraper.full_user_activity_timeline_frame(
+                self.user, start=start)
+            self.assertEqual(len(df), len(rows))
+
+            self.assertEqual(sum(self.scraper.user_daily_contrib_num(
+                self.user, 2018).values()), 3245)
+            self.assertEqual(len(self.scraper.project_contributor_stats(
+                self.repo_slug)), server.contributors)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                # the second page has the same links, the third one is empty
+                requests_before = server.stats['requests']
+                links = list(
+                    self.scraper.links_to_recent_user_activity(self.user))
+                unique = {link for _, link in links}
+                self.assertEqual(len(links), len(unique))
+                self.assertEqual(len(links), 19)
+                self.assertEqual(server.stats['requests'] - requests_before, 3)
+
+            # injected failures
+            server.error_rate = 1
+            self.assertRaises(stgithub.GitHubScrapingError,
+                              self.scraper._request, '/' + self.user)
+            self.assertEqual(server.stats[502],
+                             self.scraper.retries_on_timeout)
+            server.error_rate = 0
+
+            def hook(event, data):
+                # fail only once
+                if event == 'rate_limited':
+                    server.rate_limited_rate = 0
+                elif event == 'response' and not data['bytes']:
+                    server.empty_rate = 0
+            self.scraper.metrics.add_hook(hook)
+            server.rate_limited_rate = 1
+            server.empty_rate = 1
+            self.assertEqual(len(self.scraper.project_contributor_stats(
+                'org/repo')), server.contributors)
+            self.assertEqual(server.stats[429], 1)
+            self.assertEqual(self.scraper.limiter.max_size, 40)
+            self.assertEqual(self.scraper.identities[0].limiter.max_size, 20)
+        finally:
+            server.stop()
+            self.scraper.identities[:] = identities
+            self.scraper.metrics.hooks = []
+            del self.scraper.base_url
+            del self.scraper.retry_backoff_base
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_fake_github_keep_alive(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        with fake_github.FakeGitHub() as server:
+            scraper.base_url = server.url
+            # connections of failed streamed requests are reused
+            errors = []
+            for _ in range(5):
+                with self.assertRaises(requests.HTTPError) as context:
+                    scraper._request('/missing/page/here', stream=True)
+                errors.append(context.exception)
+            scraper._request(
+                '/users/%s/contributions' % self.user, stream=True).close()
+            self.assertEqual(server.stats['requests'], 6)
+            self.assertEqual(server.stats['connections'], 1)
+            # error pages are still available
+            self.assertEqual(errors[0].response.text, 'Not Found')
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_fake_github_feed_pages(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        with fake_github.FakeGitHub(feed_pages=3) as server:
+            scraper.base_url = server.url
+            feed = server.feed
+            # pages without links, e.g. stars and forks, do not end the feed
+            server.feed = re.sub(
+                r'<content\b.*?</content>', '', feed, flags=re.S)
+            responses = []
+
+            def restore_links(event, data):
+                # pages are rendered before responses are received,
+                # so only the first two pages have no links
+                if event == 'response':
+                    responses.append(data['url'])
+                    if len(responses) == 2:
+                        server.feed = feed
+            scraper.metrics.add_hook(restore_links)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                links = list(scraper.links_to_recent_user_activity(self.user))
+            self.assertEqual(len(links), 19)
+            self.assertEqual(len(responses), 4)
+
+            # paging stops even if GitHub never returns an empty page
+            server.feed_pages = 1000
+            scraper.feed_max_pages = 5
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                list(scraper.links_to_recent_user_activity(self.user))
+            self.assertEqual(len(responses), 9)
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_concurrent_scraper(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        self.assertIsNot(scraper, self.scraper)
+        self.assertIs(stgithub.Scraper(), self.scraper)
+        self.assertIsNot(scraper.identities, self.scraper.identities)
+
+        slugs = ['org/repo%d' % i for i in range(8)] + ['missing']
+        with fake_github.FakeGitHub(latency=0.2, timeline_months=3) as server:
+            scraper.base_url = server.url
+            started = time.time()
+            results = list(scraper.map('project_contributor_stats', slugs,
+                                       jobs=len(slugs), return_exceptions=True))
+            # requests are not serialized
+            self.assertLess(time.time() - started, 0.2 * len(slugs) / 2)
+            self.assertTrue(all(len(stats) == server.contributors
+                                for stats in results[:-1]))
+            self.assertIsInstance(results[-1], requests.HTTPError)
+            self.assertRaises(requests.HTTPError, list, scraper.map(
+                scraper.project_contributor_stats, slugs[-1:]))
+
+            timelines = list(scraper.map(
+                lambda user: scraper.full_user_activity_timeline(
+                    user, prefetch=False), ['user1', 'user2']))
+            self.assertEqual(len(timelines), 2)
+            self.assertTrue(all(isinstance(timeline, list) and timeline
+                                for timeline in timelines))
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_contributor_stats_harvester(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        scraper.retry_backoff_base = 0
+        path = tempfile.mkdtemp()
+        slugs = ['org/repo1', 'org/repo2', 'missing', 'org/failing']
+        with fake_github.FakeGitHub() as server:
+            scraper.base_url = server.url
+            harvester = stgithub.ContributorStatsHarvester(
+                path, scraper, jobs=1)
+            try:
+                def hook(event, data):
+                    # requests are sequential, the next one is org/failing
+                    if event == 'response' and 'missing' in data['url']:
+                        server.error_rate = 1
+                scraper.metrics.add_hook(hook)
+                self.assertEqual(list(harvester.harvest(iter(slugs))), [
+                    ('org/repo1', 'stored'), ('org/repo2', 'stored'),
+                    ('missing', 'not_found'), ('org/failing', 'failed')])
+                self.assertEqual(len(harvester.load('org/repo1')),
+                                 server.contributors)
+                statuses = harvester.statuses()
+                self.assertEqual(statuses['missing'], ('not_found', None))
+                self.assertEqual(statuses['org/failing'][0], 'failed')
+                self.assertEqual(len(os.listdir(path)), 3)  # 2 shards, status
+
+                # stored and missing repositories are skipped
+                scraper.metrics.hooks = []
+                server.error_rate = 0
+                self.assertEqual(list(harvester.harvest(slugs + ['org/new'])), [
+                    ('org/failing', 'stored'), ('org/new', 'stored')])
+            finally:
+                shutil.rmtree(path)
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_stats_warmup_polling(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        delays = list(scraper._stats_poll_delays())
+        # about a minute, rather than a few seconds
+        self.assertLessEqual(sum(delays), scraper.stats_wait_timeout)
+        self.assertGreater(sum(delays), scraper.stats_wait_timeout / 2)
+        self.assertLessEqual(max(delays), scraper.stats_backoff_cap)
+
+        scraper.stats_backoff_base = 0.01
+        with fake_github.FakeGitHub(stats_warmup=6) as server:
+            scraper.base_url = server.url
+            self.assertEqual(len(scraper.project_contributor_stats(
+                'org/cold')), server.contributors)
+            self.assertEqual(server.stats_requests['org/cold'], 7)
+
+            scraper.stats_wait_timeout = 0.1
+            server.stats_warmup = 1000
+            self.assertRaises(stgithub.GitHubScrapingError,
+                              scraper.project_contributor_stats, 'org/frozen')
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_contributor_stats_harvester_errors(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        path = tempfile.mkdtemp()
+        with fake_github.FakeGitHub() as server:
+            scraper.base_url = server.url
+            harvester = stgithub.ContributorStatsHarvester(path, scraper)
+
+            def store(repo_slug, stats):
+                raise OSError("No space left on device")
+            harvester._store = store
+            try:
+                # failing to store stats of a repository fails only it
+                self.assertEqual(
+                    sorted(harvester.harvest(['org/repo1', 'org/repo2'])),
+                    [('org/repo1', 'failed'), ('org/repo2', 'failed')])
+                self.assertIn('No space left',
+                              harvester.statuses()['org/repo1'][1])
+
+                # failing to record the status stops the harvest
+                def record(repo_slug, status, error=None):
+                    raise OSError("Read-only file system")
+                harvester._record = record
+                with self.assertRaises(OSError):
+                    list(harvester.harvest(['org/repo1', 'org/repo2']))
+            finally:
+                shutil.rmtree(path)
+
+    @unittest.skipIf(six.PY2, "fake_github requires Python 3")
+    def test_contributor_stats_harvester_deferred(self):
+        import fake_github
+
+        scraper = stgithub.Scraper(shared=False)
+        path = tempfile.mkdtemp()
+        with fake_github.FakeGitHub(stats_warmup=2) as server:
+            scraper.base_url = server.url
+            harvester = stgithub.ContributorStatsHarvester(
+                path, scraper, jobs=1)
+            harvester.poll_backoff_base = 0.1
+            urls = []
+            scraper.metrics.add_hook(
+                lambda event, data: event == 'response' and urls.append(
+                    data['url'].rsplit('/', 3)[1]))
+            try:
+                started = time.time()
+                self.assertEqual(
+                    sorted(harvester.harvest(['org/repo1', 'org/repo2'])),
+                    [('org/repo1', 'stored'), ('org/repo2', 'stored')])
+                # repo2 is requested while repo1 stats are not ready
+                self.assertEqual(urls[:2], ['repo1', 'repo2'])
+                self.assertEqual(sorted(urls), ['repo1'] * 3 + ['repo2'] * 3)
+                self.assertLess(time.time() - started, 2)
+
+                # give up after max_polls empty responses
+                server.stats_warmup = 10
+                harvester.max_polls = 3
+                self.assertEqual(list(harvester.harvest(['org/cold'])),
+                                 [('org/cold', 'failed')])
+                self.assertEqual(server.stats_requests['org/cold'], 3)
+                self.assertEqual(harvester.statuses()['org/cold'][0], 'failed')
+            finally:
+                shutil.rmtree(path)
+
     def test_project_contributor_stats(self):
         stats = self.scraper.project_contributor_stats(self.repo_slug)
         self.assertIsInstance(stats, list)
@@ -101,6 +941,14 @@ class TestGitHub(unittest.TestCase):
         self.assertTrue(all(isinstance(v, int) for v in contribs.values()))
         self.assertTrue(all(v >= 0 for v in contribs.values()))
 
+    def test_user_daily_contrib_range(self):
+        contribs = self.scraper.user_daily_contrib_range(
+            'user2589', '2017-06-01', '2018-12-31')
+        self.assertEqual(len(contribs), 579)
+        yearly = self.scraper.user_daily_contrib_num('user2589', 2018)
+        self.assertDictEqual(
+            yearly, {k: v for k, v in contribs.items() if k in yearly})
+
     def test_extract_activity_feed_links(self):
         fpath = os.path.join(self.fixtures_dir, 'activity_feed', 'chunk.html')
         fh = open(fpath, 'rb')
@@ -112,6 +960,31 @@ class TestGitHub(unittest.TestCase):
         self.assertEqual(date, '2019-01-09')
         self.assertEqual(href, '/CMUSTRUDEL/strudel.ghutils/tree/master')
 
+    def test_iter_activity_feed(self):
+        fpath = os.path.join(self.fixtures_dir, 'activity_feed', 'feed.xml')
+        with open(fpath, 'rb') as fh:
+            text = fh.read()
+        expected = stgithub._parse_activity_feed(text)
+        self.assertEqual(len(expected), 23)
+        self.assertEqual(expected[0], (
+            '2019-01-09', '/CMUSTRUDEL/strudel.ghutils/tree/master'))
+        for size in (1, 100, 10000):
+            self.assertEqual(list(stgithub._iter_activity_feed(
+                text[i:i + size] for i in range(0, len(text), size))),
+                expected)
+        self.assertEqual(stgithub._parse_activity_feed(
+            '<feed xmlns="http://www.w3.org/2005/Atom"></feed>'), [])
+        counter = {}
+        list(stgithub._iter_activity_feed([text], counter))
+        self.assertEqual(counter['entries'], 30)
+
+        seen = stgithub._BoundedSet(2)
+        for item in ('a', 'b', 'a', 'c'):
+            seen.add(item)
+        self.assertEqual(len(seen), 2)
+        self.assertNotIn('a', seen)
+        self.assertIn('c', seen)
+
     def test_links_to_recent_user_activity(self):
         gen = self.scraper.links_to_recent_user_activity(self.user)
         self.assertIsInstance(gen, Generator)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# Tests of stgithub_async. Async generators are a syntax error before
+# Python 3.6, so these tests live in a separate module, which is only
+# collected on Python 3.6+ (see conftest.py and `make test`).
+
+import asyncio
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import fake_github
+import stgithub
+import stgithub_async
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+class TestAsyncScraper(unittest.TestCase):
+
+    def setUp(self):
+        self.user = 'user2589'
+
+    def test_async_scraper(self):
+        async def contribs(users):
+            scraper = stgithub_async.AsyncScraper()
+            return await asyncio.gather(*(
+                scraper.user_daily_contrib_num(user, 2018) for user in users))
+
+        results = run(contribs([self.user, self.user]))
+        self.assertEqual(len(results), 2)
+        self.assertDictEqual(results[0], results[1])
+        self.assertEqual(len(results[0]), 365)
+
+    def test_fake_github(self):
+        scraper = stgithub.Scraper(shared=False)
+        # more requests than the default limit, without hibernating
+        scraper.identities[:] = [stgithub.Identity(1000, 121)]
+        scraper.retry_backoff_base = 0
+        async_scraper = stgithub_async.AsyncScraper(scraper)
+        path = tempfile.mkdtemp()
+        with fake_github.FakeGitHub(timeline_months=4) as server:
+            scraper.base_url = server.url
+            try:
+                expected = list(scraper.full_user_activity_timeline(self.user))
+                self.assertEqual(len({row['month'] for row in expected}), 4)
+                self.assertEqual(run(collect(
+                    async_scraper.full_user_activity_timeline(self.user))),
+                    expected)
+                self.assertEqual(run(collect(
+                    async_scraper.full_user_activity_timeline(
+                        self.user, compact=True))),
+                    [stgithub.ActivityRow.from_dict(row) for row in expected])
+                start = expected[-1]['month']
+                self.assertEqual(run(collect(
+                    async_scraper.full_user_activity_timeline(
+                        self.user, start=start))),
+                    list(scraper.full_user_activity_timeline(
+                        self.user, start=start)))
+
+                # the prefetched page request is cancelled on early exit
+                async def first_row():
+                    gen = async_scraper.full_user_activity_timeline(self.user)
+                    async for row in gen:
+                        break
+                    await gen.aclose()
+                    await asyncio.sleep(0)
+                    # asyncio.all_tasks() and current_task() are 3.7+
+                    all_tasks = getattr(asyncio, 'all_tasks', None) \
+                        or asyncio.Task.all_tasks
+                    current_task = getattr(asyncio, 'current_task', None) \
+                        or asyncio.Task.current_task
+                    pending = [task for task in all_tasks()
+                               if not task.done() and task is not current_task()]
+                    return row, pending
+                row, pending = run(first_row())
+                self.assertEqual(row, expected[0])
+                self.assertEqual(pending, [])
+
+                # interrupted timelines are resumed from the checkpoint
+                checkpoint = stgithub.TimelineCheckpoint(path)
+
+                def fail_after_first_page(event, data):
+                    if event == 'response':
+                        server.error_rate = 1
+                scraper.metrics.add_hook(fail_after_first_page)
+                first_page = []
+
+                async def interrupted():
+                    async for row in async_scraper.full_user_activity_timeline(
+                            self.user, checkpoint=checkpoint):
+                        first_page.append(row)
+                        # changes made by the consumer are not saved
+                        row['user'] = self.user
+                with self.assertRaises(stgithub.GitHubScrapingError):
+                    run(interrupted())
+                scraper.metrics.hooks.remove(fail_after_first_page)
+                server.error_rate = 0
+                self.assertGreater(len(first_page), 0)
+                self.assertLess(len(first_page), len(expected))
+
+                requests_before = server.stats['requests']
+                self.assertEqual(run(collect(
+                    async_scraper.full_user_activity_timeline(
+                        self.user, checkpoint=checkpoint))), expected)
+                # the first page is not requested again
+                self.assertEqual(server.stats['requests'] - requests_before, 3)
+
+                self.assertEqual(
+                    run(async_scraper.user_daily_contrib_range(
+                        self.user, '2018-01-01', '2018-12-31')),
+                    scraper.user_daily_contrib_range(
+                        self.user, '2018-01-01', '2018-12-31'))
+
+                # links repeated on the second page are skipped
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', DeprecationWarning)
+                    requests_before = server.stats['requests']
+                    links = run(collect(
+                        async_scraper.links_to_recent_user_activity(
+                            self.user)))
+                    self.assertEqual(
+                        server.stats['requests'] - requests_before, 3)
+                    self.assertEqual(links, list(
+                        scraper.links_to_recent_user_activity(self.user)))
+                self.assertEqual(len(links), 19)
+                self.assertEqual(len(set(links)), len(links))
+
+                # stats being computed are polled again with backoff
+                server.stats_warmup = 3
+                scraper.stats_backoff_base = 0.01
+                self.assertEqual(len(run(
+                    async_scraper.project_contributor_stats('org/cold'))),
+                    server.contributors)
+                self.assertEqual(server.stats_requests['org/cold'], 4)
+                scraper.stats_wait_timeout = 0.05
+                server.stats_warmup = 1000
+                with self.assertRaises(stgithub.GitHubScrapingError):
+                    run(async_scraper.project_contributor_stats('org/frozen'))
+            finally:
+                shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    unittest.main()